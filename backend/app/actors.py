@@ -0,0 +1,113 @@
+"""One command queue per game.
+
+Everything that changes a running game (player messages, the turn timer,
+bots) goes through GameManager.actors.submit, which queues the command on
+the game's actor. The actor applies its commands one at a time in arrival
+order and broadcasts once per batch: commands that queue up while a
+broadcast is being sent are applied together and covered by a single
+broadcast afterwards. After every batch the game's watcher, if any, is
+woken up (Actors.watch).
+"""
+import asyncio
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
+
+from .models import GameState
+from .exceptions import GameException
+from .delta import broadcast_game
+
+if TYPE_CHECKING:
+    from .game import GameManager
+
+
+class GameActor:
+    def __init__(self, manager: "GameManager", lobby_id: str, game_id: str):
+        self.manager = manager
+        self.lobby_id = lobby_id
+        self.game_id = game_id
+        self.queue: asyncio.Queue[Tuple[str, Tuple[Any, ...], asyncio.Future]] = asyncio.Queue()
+        self.task = asyncio.create_task(self._run())
+
+    async def submit(self, command: str, *args) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((command, args, future))
+        return await future
+
+    def _take_batch(self, first) -> List[Tuple[str, Tuple[Any, ...], asyncio.Future]]:
+        batch = [first]
+        while not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        try:
+            while True:
+                batch = self._take_batch(await self.queue.get())
+                changed = False
+                for command, args, future in batch:
+                    try:
+                        result = getattr(self.manager, command)(self.game_id, *args)
+                    except Exception as e:
+                        if not future.cancelled():
+                            future.set_exception(e)
+                        continue
+                    changed = changed or result is not None
+                    if not future.cancelled():
+                        future.set_result(result)
+
+                game = self.manager.get_game(self.game_id)
+                if changed and game:
+                    try:
+                        await broadcast_game(self.lobby_id, game)
+                    except Exception as e: # the commands are applied, only this broadcast is lost
+                        print(f"Broadcast of game {self.game_id} failed: {e!r}")
+                self.manager.actors.notify(self.game_id)
+                if not game or (game.game_state == GameState.FINISHED and self.queue.empty()):
+                    break
+        finally:
+            self.manager.actors.forget(self.game_id, self)
+            self.manager.actors.notify(self.game_id)
+            # nothing reads the queue any more
+            while not self.queue.empty():
+                _, _, future = self.queue.get_nowait()
+                if not future.done():
+                    future.set_exception(GameException("Игра недоступна, повторите команду."))
+
+
+class Actors:
+    """game id -> its running GameActor, started on the first command."""
+
+    def __init__(self, manager: "GameManager"):
+        self.manager = manager
+        self._actors: Dict[str, GameActor] = {}
+        # game id -> event set after every batch of its commands
+        self._watchers: Dict[str, asyncio.Event] = {}
+
+    async def submit(self, lobby_id: str, game_id: str, command: str, *args) -> Any:
+        """Applies manager.`command`(game_id, *args) in the game's order and
+        returns its result; GameException is raised to the caller."""
+        actor = self._actors.get(game_id)
+        if actor is None:
+            if not self.manager.get_game(game_id):
+                raise GameException("Игра не найдена.")
+            actor = self._actors[game_id] = GameActor(self.manager, lobby_id, game_id)
+        return await actor.submit(command, *args)
+
+    def watch(self, game_id: str) -> asyncio.Event:
+        """An event the game's actor sets after every batch it applies; the
+        watcher clears it before waiting."""
+        return self._watchers.setdefault(game_id, asyncio.Event())
+
+    def unwatch(self, game_id: str):
+        self._watchers.pop(game_id, None)
+
+    def notify(self, game_id: str):
+        event = self._watchers.get(game_id)
+        if event:
+            event.set()
+
+    def forget(self, game_id: str, actor: GameActor):
+        if self._actors.get(game_id) is actor:
+            del self._actors[game_id]
+
+    def __len__(self):
+        return len(self._actors)
@@ -1,55 +1,57 @@
-from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi import APIRouter, Depends, HTTPException, Body, Query, Request, Response
 import uuid
 from typing import Annotated
 
 from .lobby import lobby_manager, LobbyManager
-from .schemas import PlayerCreate, LobbyInfo, LobbyJoinResponse, CharacterSelectRequest, GameStateInfo, PlayerInfo, KickPlayerRequest
+from . import shards
+from .catalog import catalog
+from .schemas import PlayerCreate, LobbyInfo, LobbyJoinResponse, CharacterSelectRequest, GameStateInfo, KickPlayerRequest, AddBotRequest, GameLogPage
 from .exceptions import LobbyException, LobbyNotFound, CharacterAlreadyTaken, PlayerNotFound, CharacterNotFound
 
 router = APIRouter()
 
 def get_lobby_manager():
-    return lobby_manager
+    # with engine shards the lobbies live in the shard processes
+    return shards.sharded_lobby_manager if shards.ENGINE_SHARDS else lobby_manager
+
+@router.get("/catalog")
+async def get_catalog(request: Request):
+    headers = {"ETag": catalog.etag, "Cache-Control": "public, max-age=3600"}
+    if request.headers.get("if-none-match") == catalog.etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=catalog.body, media_type="application/json", headers=headers)
+
+@router.get("/stats")
+async def get_stats():
+    return await shards.stats()
 
 @router.post("/lobby/create", response_model=LobbyJoinResponse)
 async def create_lobby(player: PlayerCreate, lm: LobbyManager = Depends(get_lobby_manager)):
     host_id = str(uuid.uuid4())
     lobby = await lm.create_lobby(host_id, player.nickname)
-    lobby_info = LobbyInfo(
-        id=lobby.id, 
-        host_id=lobby.host_id, 
-        players=[PlayerInfo(**p.dict()) for p in lobby.players]
-    )
+    lobby_info = LobbyInfo.model_validate(lobby)
     return LobbyJoinResponse(lobby_info=lobby_info, player_id=host_id)
 
 @router.post("/lobby/training", response_model=LobbyJoinResponse)
 async def create_training_lobby(player: PlayerCreate, lm: LobbyManager = Depends(get_lobby_manager)):
     host_id = str(uuid.uuid4())
     lobby = await lm.create_lobby(host_id, player.nickname, is_training=True)
-    lobby_info = LobbyInfo(
-        id=lobby.id,
-        host_id=lobby.host_id,
-        players=[PlayerInfo(**p.dict()) for p in lobby.players]
-    )
+    lobby_info = LobbyInfo.model_validate(lobby)
     return LobbyJoinResponse(lobby_info=lobby_info, player_id=host_id)
 
 @router.get("/lobby/{lobby_id}", response_model=LobbyInfo)
-async def get_lobby(lobby_id: str, lm: LobbyManager = Depends(get_lobby_manager)):
-    lobby = lm.get_lobby(lobby_id)
+async def get_lobby(lobby_id: str):
+    lobby = await shards.call(lobby_id, "get_lobby", lobby_id)
     if not lobby:
         raise HTTPException(status_code=404, detail="Lobby not found")
-    return lobby
+    return LobbyInfo.model_validate(lobby)
 
 @router.post("/lobby/{lobby_id}/join", response_model=LobbyJoinResponse)
 async def join_lobby(lobby_id: str, player: PlayerCreate, lm: LobbyManager = Depends(get_lobby_manager)):
     try:
         player_id = str(uuid.uuid4())
         lobby = await lm.join_lobby(lobby_id, player_id, player.nickname)
-        lobby_info = LobbyInfo(
-            id=lobby.id,
-            host_id=lobby.host_id,
-            players=[PlayerInfo(**p.dict()) for p in lobby.players]
-        )
+        lobby_info = LobbyInfo.model_validate(lobby)
         return LobbyJoinResponse(lobby_info=lobby_info, player_id=player_id)
     except LobbyNotFound as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -60,7 +62,7 @@ async def join_lobby(lobby_id: str, player: PlayerCreate, lm: LobbyManager = Dep
 async def select_character(lobby_id: str, selection: CharacterSelectRequest, lm: LobbyManager = Depends(get_lobby_manager)):
     try:
         lobby = await lm.select_character(lobby_id, selection.player_id, selection.character_id)
-        return lobby
+        return LobbyInfo.model_validate(lobby)
     except (LobbyNotFound, PlayerNotFound, CharacterNotFound) as e:
         raise HTTPException(status_code=404, detail=str(e))
     except CharacterAlreadyTaken as e:
@@ -76,7 +78,7 @@ async def start_game(lobby_id: str, player_id_body: Annotated[dict, Body()], lm:
     
     try:
         game = await lm.start_game(lobby_id, player_id)
-        return game
+        return GameStateInfo.model_validate(game)
     except (LobbyNotFound, PlayerNotFound) as e:
         raise HTTPException(status_code=404, detail=str(e))
     except LobbyException as e:
@@ -84,14 +86,33 @@ async def start_game(lobby_id: str, player_id_body: Annotated[dict, Body()], lm:
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/lobby/{lobby_id}/bot", response_model=LobbyInfo)
+async def add_bot(lobby_id: str, request: AddBotRequest, lm: LobbyManager = Depends(get_lobby_manager)):
+    try:
+        lobby = await lm.add_bot(lobby_id, request.host_id)
+        return LobbyInfo.model_validate(lobby)
+    except LobbyNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except LobbyException as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/lobby/{lobby_id}/kick", response_model=LobbyInfo)
 async def kick_player(lobby_id: str, request: KickPlayerRequest, lm: LobbyManager = Depends(get_lobby_manager)):
     try:
         lobby = await lm.kick_player(lobby_id, request.host_id, request.player_to_kick_id)
-        return lobby
+        return LobbyInfo.model_validate(lobby)
     except (LobbyNotFound, PlayerNotFound) as e:
         raise HTTPException(status_code=404, detail=str(e))
     except LobbyException as e:
         raise HTTPException(status_code=403, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/game/{game_id}/log", response_model=GameLogPage)
+async def get_game_log(game_id: str, before: int | None = None, limit: int = Query(50, ge=1, le=200)):
+    page = await shards.call(game_id, "game_log", game_id, before, limit)
+    if not page:
+        raise HTTPException(status_code=404, detail="Game not found")
+    return page
@@ -0,0 +1,28 @@
+# Balance numbers of the random and compounding card mechanics.
+# Read by the engine (game.py) and by the Monte Carlo estimator
+# (montecarlo.py), so change them here and nowhere else.
+
+# Black Flash: succeeds if a d6 roll is <= the chance
+BLACK_FLASH_DIE = 6
+BLACK_FLASH_CHANCE = 1
+BLACK_FLASH_CHANCE_ZONE = 2
+BLACK_FLASH_CHANCE_ITADORI = 2
+BLACK_FLASH_CHANCE_ITADORI_ZONE = 3
+BLACK_FLASH_HIT_DAMAGE = 2500
+BLACK_FLASH_MISS_DAMAGE = 100
+
+# Zone, granted by a successful Black Flash
+ZONE_DURATION = 4 # 3 of the player's turns + the current one
+ZONE_TECHNIQUE_MULTIPLIER = 1.25
+ZONE_ENERGY_RECOVERY = 0.05 # of max energy, at the start of each turn
+
+# Concentration / Reverse Cursed Technique: random percent of max energy / HP
+CONCENTRATION_PERCENT = (5, 15)
+RCT_HEAL_PERCENT = (5, 15)
+
+# Jogo's passive: every technique hit sets (or refreshes) the burn
+BURN_DAMAGE = 100 # at the start of each of the target's turns
+BURN_DURATION = 2
+
+# Chant: next technique this turn
+CHANT_MULTIPLIER = 1.5
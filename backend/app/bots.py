@@ -0,0 +1,286 @@
+"""Server-side AI opponents.
+
+A bot is a lobby player whose id starts with BOT_ID_PREFIX. On its turn the
+server asks a worker process for the next move: Monte Carlo tree search over
+clones of the game (Game.clone) with the moves of rules.legal_moves,
+stopped after MOVE_TIME_BUDGET seconds. The search runs out of process so
+the event loop keeps serving the other games meanwhile; the worker pool is
+started with the first game that has bots. Between its turns a game's bot
+driver sleeps until the game's actor applies something (Actors.watch).
+
+The tree covers the bot's own decisions in the current turn; every leaf is
+valued by a quick playout of the following ROLLOUT_TURNS turns. Each
+iteration reshuffles the cards the bot can't see (its deck, the opponents'
+hands and decks) and reseeds the RNG, so the search never uses hidden
+information.
+"""
+import asyncio
+import math
+import os
+import random
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+from typing import List, Optional
+
+from .models import Game, GameState, PlayerStatus
+from .content import card_templates
+from .exceptions import GameException
+from .game import GameManager, game_manager
+from .rules import Move, legal_moves
+from .snapshot import dump_game, load_game
+
+BOT_ID_PREFIX = "bot_"
+MOVE_TIME_BUDGET = float(os.environ.get("BOT_MOVE_TIME", "0.5")) # seconds
+# extra time the server waits for a worker before giving up on the move
+MOVE_TIMEOUT_MARGIN = 0.5
+BOT_WORKERS = int(os.environ.get("BOT_WORKERS", "2"))
+
+ROLLOUT_TURNS = 4
+ROLLOUT_END_TURN_CHANCE = 0.2
+# rollouts mostly play the most expensive card, like sim.GreedyAgent
+ROLLOUT_GREEDY_CHANCE = 0.7
+EXPLORATION = 1.4
+# a bot turn is cut off after this many cards, like in sim.py
+MAX_PLAYS_PER_TURN = 30
+
+
+def is_bot(player_id: str) -> bool:
+    return player_id.startswith(BOT_ID_PREFIX)
+
+
+# --- Search ---
+
+class _Node:
+    __slots__ = ("move", "parent", "children", "untried", "visits", "value")
+
+    def __init__(self, move: Optional[Move], parent: Optional["_Node"], untried: List[Optional[Move]]):
+        self.move = move # None ends the turn
+        self.parent = parent
+        self.children: List[_Node] = []
+        self.untried = untried
+        self.visits = 0
+        self.value = 0.0
+
+    def ucb(self, parent_visits: int) -> float:
+        return self.value / self.visits + EXPLORATION * math.sqrt(math.log(parent_visits) / self.visits)
+
+
+def _is_turn_of(game: Game, player_id: str) -> bool:
+    return game.game_state != GameState.FINISHED and game.players[game.current_turn_player_index].id == player_id
+
+
+def _choices(gm: GameManager, game: Game, player_id: str, depth: int) -> List[Optional[Move]]:
+    """Moves of a tree node: the legal plays plus ending the turn."""
+    if not _is_turn_of(game, player_id):
+        return []
+    if depth >= MAX_PLAYS_PER_TURN:
+        return [None]
+    return legal_moves(game, player_id) + [None]
+
+
+def _apply(gm: GameManager, game: Game, player_id: str, move: Optional[Move]) -> bool:
+    try:
+        if move is None:
+            gm.end_turn(game.game_id, player_id)
+        else:
+            gm.play_card(game.game_id, player_id, *move)
+    except GameException:
+        # the move was legal in the tree's first determinization, not in this one
+        return False
+    return True
+
+
+def _determinize(game: Game, player_id: str, rng: random.Random):
+    for p in game.players:
+        if p.id == player_id:
+            deck = p.deck[:]
+            rng.shuffle(deck)
+            p.set_deck(deck)
+        else:
+            unseen = p.hand + p.deck
+            rng.shuffle(unseen)
+            p.hand = unseen[:len(p.hand)]
+            p.set_deck(unseen[len(p.hand):])
+
+
+def _rollout_move(moves: List[Move], rng: random.Random) -> Move:
+    # card first, then its targets: multi-target cards have many moves each
+    card_ids = sorted({m[0] for m in moves})
+    if rng.random() < ROLLOUT_GREEDY_CHANCE:
+        card_id = max(card_ids, key=lambda card_id: card_templates[card_id].cost)
+    else:
+        card_id = rng.choice(card_ids)
+    return rng.choice([m for m in moves if m[0] == card_id])
+
+
+def _rollout(gm: GameManager, game: Game, rng: random.Random):
+    for _ in range(ROLLOUT_TURNS):
+        if game.game_state == GameState.FINISHED:
+            return
+        player_id = game.players[game.current_turn_player_index].id
+        for _ in range(MAX_PLAYS_PER_TURN):
+            moves = legal_moves(game, player_id)
+            if not moves or rng.random() < ROLLOUT_END_TURN_CHANCE:
+                break
+            gm.play_card(game.game_id, player_id, *_rollout_move(moves, rng))
+            if not _is_turn_of(game, player_id):
+                break
+        if _is_turn_of(game, player_id):
+            gm.end_turn(game.game_id, player_id)
+
+
+def _evaluate(game: Game, player_id: str) -> float:
+    """1 for a win, 0 for a loss, otherwise by the HP lead over the opponents."""
+    me = game.player(player_id)
+    if me.status != PlayerStatus.ALIVE:
+        return 0.0
+    opponents = [p for p in game.alive_players() if p.id != player_id]
+    if not opponents:
+        return 1.0
+    mine = me.hp / me.character.max_hp
+    theirs = sum(p.hp / p.character.max_hp for p in opponents) / len(opponents)
+    return 0.5 + (mine - theirs) / 2
+
+
+def search(game: Game, player_id: str, budget: float = MOVE_TIME_BUDGET, seed: Optional[int] = None) -> Optional[Move]:
+    """Best move for `player_id` found within `budget` seconds, None to end the turn."""
+    deadline = time.perf_counter() + budget
+    rng = random.Random(seed)
+    gm = GameManager() # scratch manager: no event log
+    root = _Node(None, None, _choices(gm, game, player_id, 0))
+    if len(root.untried) <= 1:
+        return None
+
+    while time.perf_counter() < deadline:
+        sim = game.clone(seed=rng.getrandbits(64))
+        _determinize(sim, player_id, rng)
+        gm.games[sim.game_id] = sim
+        node, depth = root, 0
+        try:
+            while not node.untried and node.children:
+                node = max(node.children, key=lambda c: c.ucb(node.visits))
+                depth += 1
+                if not _apply(gm, sim, player_id, node.move):
+                    break
+            else:
+                if node.untried:
+                    move = node.untried.pop(rng.randrange(len(node.untried)))
+                    if _apply(gm, sim, player_id, move):
+                        child = _Node(move, node, _choices(gm, sim, player_id, depth + 1) if move is not None else [])
+                        node.children.append(child)
+                        node = child
+                if node.move is not None and _is_turn_of(sim, player_id):
+                    _apply(gm, sim, player_id, None) # the rollout starts with the next player
+                _rollout(gm, sim, rng)
+        except Exception: # an engine bug in one playout should not cost the bot its move
+            continue
+        value = _evaluate(sim, player_id)
+        while node is not None:
+            node.visits += 1
+            node.value += value
+            node = node.parent
+
+    if not root.children:
+        return None
+    return max(root.children, key=lambda c: c.visits).move
+
+
+def _search_snapshot(data: bytes, player_id: str, budget: float, deadline: float) -> Optional[Move]:
+    # a search that waited in the pool's queue only gets what is left until
+    # `deadline` (time.time()), the server stops waiting for it soon after
+    budget = min(budget, deadline - time.time())
+    if budget <= 0:
+        return None
+    return search(load_game(data), player_id, budget)
+
+
+# --- Driving bots in live games ---
+
+_pool: ProcessPoolExecutor | None = None
+# done once a worker of the pool is up
+_pool_ready: Future | None = None
+
+
+def _executor() -> ProcessPoolExecutor:
+    global _pool, _pool_ready
+    if _pool is None:
+        # spawn: forking the running server would copy its sockets and threads
+        _pool = ProcessPoolExecutor(BOT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        # start all the workers now, spawning one takes longer than a move may
+        _pool_ready = _pool.submit(int)
+        for _ in range(BOT_WORKERS - 1):
+            _pool.submit(int)
+    return _pool
+
+
+def shutdown(wait: bool = False):
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=wait, cancel_futures=True)
+        _pool = None
+
+
+async def choose_move(game: Game, player_id: str) -> Optional[Move]:
+    """Searches in a worker process; ends the turn if it takes too long."""
+    loop = asyncio.get_running_loop()
+    pool = _executor()
+    try:
+        # the time budget starts once the pool has a worker
+        await asyncio.wrap_future(_pool_ready)
+        deadline = time.time() + MOVE_TIME_BUDGET
+        # on timeout wait_for cancels the search if it hasn't started yet
+        future = loop.run_in_executor(pool, _search_snapshot, dump_game(game), player_id, MOVE_TIME_BUDGET, deadline)
+        return await asyncio.wait_for(future, MOVE_TIME_BUDGET + MOVE_TIMEOUT_MARGIN)
+    except asyncio.TimeoutError:
+        print(f"Bot {player_id} in game {game.game_id} ran out of time.")
+    except BrokenProcessPool:
+        shutdown()
+    return None
+
+
+async def run_bots(lobby_id: str, game_id: str):
+    """Plays the turns of the game's bots until the game is over."""
+    _executor()
+    changed = game_manager.actors.watch(game_id)
+    try:
+        await _drive(lobby_id, game_id, changed)
+    finally:
+        game_manager.actors.unwatch(game_id)
+    print(f"Bots of game {game_id} finished.")
+
+
+async def _drive(lobby_id: str, game_id: str, changed: asyncio.Event):
+    plays = 0
+    while True:
+        game = game_manager.get_game(game_id)
+        if not game or game.game_state == GameState.FINISHED:
+            break
+        player = game.players[game.current_turn_player_index]
+        if not is_bot(player.id):
+            plays = 0
+            changed.clear()
+            await changed.wait()
+            continue
+
+        version = game.version
+        move = await choose_move(game, player.id) if plays < MAX_PLAYS_PER_TURN else None
+        if game.version != version:
+            continue # somebody else changed the game while the bot was thinking
+        # through the game's queue like a player's messages, it also broadcasts
+        try:
+            if move is None:
+                await game_manager.actors.submit(lobby_id, game_id, "end_turn", player.id)
+                plays = 0
+            else:
+                await game_manager.actors.submit(lobby_id, game_id, "play_card", player.id, *move)
+                plays += 1
+        except GameException:
+            # the move is not legal any more, e.g. the game changed while it was queued
+            if _is_turn_of(game, player.id):
+                try:
+                    await game_manager.actors.submit(lobby_id, game_id, "end_turn", player.id)
+                except GameException:
+                    pass
+            plays = 0
@@ -0,0 +1,54 @@
+import hashlib
+from typing import Any, Dict
+
+import orjson
+
+from .models import Card, CardInstance
+from .content import common_cards, characters, card_templates
+
+# Card fields that may differ between an in-game card and its template
+INSTANCE_FIELDS = ("cost", "is_copied", "source_player_id", "duration")
+
+
+def _build_catalog() -> Dict[str, Any]:
+    cards = {card_id: c.model_dump(mode="json") for card_id, c in card_templates.items()}
+    chars = {}
+    for ch in characters:
+        data = ch.model_dump(mode="json", exclude={"unique_cards"})
+        data["unique_card_ids"] = [c.id for c in ch.unique_cards]
+        chars[ch.id] = data
+    return {
+        "common_card_ids": [c.id for c in common_cards],
+        "cards": cards,
+        "characters": chars,
+    }
+
+
+class Catalog:
+    """Static card/character data, encoded once at startup.
+
+    Game state refers to cards by id; clients resolve them against this
+    catalog, which only changes when content.py does.
+    """
+
+    def __init__(self):
+        data = _build_catalog()
+        self.version = hashlib.sha1(orjson.dumps(data, option=orjson.OPT_SORT_KEYS)).hexdigest()[:16]
+        data["version"] = self.version
+        self.etag = f'"{self.version}"'
+        self.body: bytes = orjson.dumps(data)
+        self._templates: Dict[str, Dict[str, Any]] = data["cards"]
+
+    def card_ref(self, card: Card | CardInstance) -> Dict[str, Any]:
+        """Wire form of an in-game card: its id plus the fields that differ
+        from the template (e.g. the cost and flag of a card copied by Yuta)."""
+        ref: Dict[str, Any] = {"id": card.id}
+        template = self._templates.get(card.id)
+        for field in INSTANCE_FIELDS:
+            value = getattr(card, field)
+            if template is None or template[field] != value:
+                ref[field] = value
+        return ref
+
+
+catalog = Catalog()
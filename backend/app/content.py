@@ -1,3 +1,7 @@
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping, Optional
+
 from .models import Card, CardType, Rarity, Character
 
 # --- Общие карты ---
@@ -365,3 +369,99 @@ characters = [
         ]
     ),
 ]
+
+# --- Реестр, собирается один раз при загрузке модуля ---
+
+# id эффектов, на которые ссылается движок
+EFFECT_ID_SOUL_DISTORTION = "mahito_self_embodiment_of_perfection" # Махито РТ дебафф
+EFFECT_ID_UNLIMITED_VOID = "gojo_unlimited_void" # Годзё РТ дебафф
+EFFECT_ID_DIVERGENT_FIST_DOT = "itadori_divergent_fist_dot"
+EFFECT_ID_BURN = "jogo_burn"
+EFFECT_ID_FREE_STRIKE = "free_strike_effect"
+
+# Условия розыгрыша карт (проверяются в rules.check_play)
+CONDITION_BLUE_AND_RED = "blue_and_red"
+CONDITION_BLACK_FLASH = "successful_black_flash"
+CONDITION_LOW_HP = "low_hp"
+
+_card_conditions = {
+    "gojo_purple": CONDITION_BLUE_AND_RED,
+    "mahito_true_form": CONDITION_BLACK_FLASH,
+    "gojo_remove_blindfold": CONDITION_LOW_HP,
+}
+
+# Стоимость в Искажённых Душах
+_soul_costs = {
+    "mahito_polymorphic_soul_isomer": 1,
+    "mahito_body_repel": 3,
+}
+
+# Карты, которые бьют по нескольким целям на выбор (targets_ids) -> число целей
+_target_counts = {
+    "jogo_ember_insects": 3,
+}
+
+# Карты, которые разыгрываются на одного противника (target_id)
+_targeted_cards = {
+    "common_strike", "common_black_flash",
+    "gojo_strengthened_strike", "gojo_infinity", "gojo_red", "gojo_purple",
+    "sukuna_cleave", "sukuna_dismantle", "sukuna_spiderweb", "sukuna_kamino",
+    "mahito_soul_distortion", "mahito_body_repel",
+    "itadori_divergent_fist", "itadori_manji_kick",
+    "jogo_maximum_meteor",
+    "yuta_energy_blade",
+}
+
+# Эффекты, id которых не совпадает с id карты -> id карты с нужным названием
+_effect_card_aliases = {
+    "itadori_divergent_fist_dot": "itadori_divergent_fist",
+    "manji_kick_counter": "itadori_manji_kick",
+    "gojo_blue_effect": "gojo_blue",
+    "gojo_red_effect": "gojo_red",
+}
+
+_effect_extra_names = {
+    "zone": "Зона",
+    "gojo_blindfold": "Повязка",
+    "jogo_burn": "Горение",
+    "free_strike_effect": "Бесплатный Удар",
+}
+
+
+@dataclass(frozen=True)
+class CardMeta:
+    """Precomputed flags for a card template, so the engine never has to
+    inspect card types or descriptions while resolving a play."""
+    is_attacking: bool
+    is_technique: bool
+    is_domain: bool
+    soul_cost: int = 0
+    condition: Optional[str] = None
+    needs_target: bool = False # played on one opponent, target_id
+    target_count: int = 0 # > 0 if the card takes targets_ids instead of target_id
+
+
+def _card_meta(card: Card) -> CardMeta:
+    return CardMeta(
+        is_attacking=card.type in (CardType.TECHNIQUE, CardType.ACTION) and "Наносит" in card.description,
+        is_technique=card.type == CardType.TECHNIQUE,
+        is_domain=card.type == CardType.DOMAIN_EXPANSION,
+        soul_cost=_soul_costs.get(card.id, 0),
+        condition=_card_conditions.get(card.id),
+        needs_target=card.id in _targeted_cards,
+        target_count=_target_counts.get(card.id, 0),
+    )
+
+
+card_templates: Mapping[str, Card] = MappingProxyType({
+    c.id: c for c in common_cards + [c for ch in characters for c in ch.unique_cards]
+})
+card_meta: Mapping[str, CardMeta] = MappingProxyType({
+    card_id: _card_meta(card) for card_id, card in card_templates.items()
+})
+characters_by_id: Mapping[str, Character] = MappingProxyType({ch.id: ch for ch in characters})
+effect_names: Mapping[str, str] = MappingProxyType({
+    **{card_id: card.name for card_id, card in card_templates.items()},
+    **{effect_id: card_templates[card_id].name for effect_id, card_id in _effect_card_aliases.items()},
+    **_effect_extra_names,
+})
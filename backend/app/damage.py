@@ -0,0 +1,163 @@
+"""Damage as a pipeline of modifiers, see GameManager._attack / _deal_damage.
+
+An Attack is resolved once per action from the attacker's current state:
+which attacker modifiers are active (Zone, chant) and whether its hits set
+Jogo's burn. Attack.hit then runs the defender's side for every target, so
+AoE cards resolve the attacker once and hit all opponents with it.
+
+For every target the pipeline is, in this order:
+    on-hit triggers    Isomer backlash, Yuta's copy, Sukuna's energy, Jogo's burn
+    attacker modifiers Zone, chant                 (resolved once per Attack)
+    defender modifiers Falling Blossom, True Form  (per target)
+    block
+Each modifier multiplies the damage and rounds down. When
+GameManager.damage_trace is a list, every hit is appended to it as a Hit
+with the names of the modifiers and triggers that fired.
+"""
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable, List, Optional, Tuple
+
+from .models import Card, CardInstance, CardType, Game, Player, PlayerStatus
+from .content import card_templates, EFFECT_ID_BURN
+from . import balance
+
+if TYPE_CHECKING:
+    from .game import GameManager
+
+ISOMER_BACKLASH_DAMAGE = 500
+
+
+@dataclass(slots=True, frozen=True)
+class Modifier:
+    name: str
+    multiplier: float
+    # attacker modifiers get the Attack, defender modifiers (Attack, target)
+    applies: Callable[..., bool]
+
+
+ATTACKER_MODIFIERS: Tuple[Modifier, ...] = (
+    Modifier("zone", balance.ZONE_TECHNIQUE_MULTIPLIER,
+             lambda a: a.card_type == CardType.TECHNIQUE and a.source.has_effect("zone")),
+    Modifier("chant", balance.CHANT_MULTIPLIER,
+             lambda a: a.source.chant_active_for_turn),
+)
+
+DEFENDER_MODIFIERS: Tuple[Modifier, ...] = (
+    Modifier("falling_blossom", 0.67, # Reduce damage by 33%
+             lambda a, t: t.has_effect("common_falling_blossom_emotion")),
+    # Mahito's "True Body" damage reduction
+    Modifier("true_form", 0.5,
+             lambda a, t: t.has_effect("mahito_true_form") and a.card is not None and a.card.id == "common_strike"),
+)
+
+
+@dataclass(slots=True)
+class Hit:
+    """Trace of one hit."""
+    source_id: Optional[str]
+    target_id: str
+    card_id: Optional[str]
+    damage: int # before the modifiers
+    dealt: int = 0 # HP the target lost
+    blocked: int = 0
+    fired: List[str] = field(default_factory=list)
+    # card or effect the damage is credited to, see Attack.cause
+    cause: Optional[str] = None
+
+
+class Attack:
+    """Damage dealt by `source` (None for backlash without an attacker) in one
+    action. Create it when the damage is dealt, not in advance: it captures
+    the attacker's effects at that moment. `cause` names the card or effect
+    the damage comes from (the card's id by default); it only goes into the
+    trace and changes nothing in the game."""
+    __slots__ = ("gm", "game", "source", "card", "card_type", "ignores_block", "is_effect_damage", "cause", "modifiers", "sets_burn")
+
+    def __init__(self, gm: "GameManager", game: Game, source: Optional[Player], card: Card | CardInstance | None = None,
+                 card_type: Optional[CardType] = None, ignores_block: bool = False, is_effect_damage: bool = False,
+                 cause: Optional[str] = None):
+        self.gm = gm
+        self.game = game
+        self.source = source
+        self.card = card
+        self.card_type = card_type
+        self.ignores_block = ignores_block
+        self.is_effect_damage = is_effect_damage
+        self.cause = cause or (card.id if card else None)
+        self.modifiers = [m for m in ATTACKER_MODIFIERS if m.applies(self)] if source else []
+        # Jogo Passive (Burn)
+        self.sets_burn = bool(source and source.character and source.character.id == "jogo" and card_type == CardType.TECHNIQUE)
+
+    def hit(self, target: Player, damage: int) -> Optional[Hit]:
+        if target.status == PlayerStatus.DEFEATED:
+            return None
+        game, source = self.game, self.source
+        trace = Hit(source.id if source else None, target.id, self.card.id if self.card else None, damage, cause=self.cause)
+
+        self._on_hit(target, damage, trace)
+
+        for modifier in self.modifiers:
+            damage = int(damage * modifier.multiplier)
+            trace.fired.append(modifier.name)
+        for modifier in DEFENDER_MODIFIERS:
+            if modifier.applies(self, target):
+                damage = int(damage * modifier.multiplier)
+                trace.fired.append(modifier.name)
+
+        if not self.ignores_block:
+            trace.blocked = min(target.block, damage)
+            target.block -= trace.blocked
+            damage -= trace.blocked
+        elif source:
+            # Mahito condition counter
+            source.ignore_block_attacks_count += 1
+
+        target.hp -= damage
+        trace.dealt = damage
+        if source:
+            game.game_log.append(f"{source.nickname} наносит {damage} урона {target.nickname}.")
+
+        if target.hp <= 0 and not target.has_effect("itadori_unwavering_will"):
+            self.gm._defeat_player(game, target)
+
+        if self.gm.damage_trace is not None:
+            self.gm.damage_trace.append(trace)
+        return trace
+
+    def _on_hit(self, target: Player, damage: int, trace: Hit):
+        game, source, card = self.game, self.source, self.card
+
+        # Polymorphic Soul Isomer backlash
+        isomer_effect = target.get_effect("mahito_polymorphic_soul_isomer")
+        if isomer_effect and not self.ignores_block and damage > target.block:
+            trace.fired.append("isomer_backlash")
+            if source:
+                Attack(self.gm, game, None, ignores_block=True, is_effect_damage=True,
+                       cause=isomer_effect.name).hit(source, ISOMER_BACKLASH_DAMAGE)
+                game.game_log.append(f"{source.nickname} получает {ISOMER_BACKLASH_DAMAGE} ответного урона от 'Полиморфной Изомерной Души'!")
+            target.remove_effect(isomer_effect)
+
+        # Apply Yuta's passive
+        if not self.is_effect_damage and target.character and target.character.id == "yuta_okkotsu" and card and card.type == CardType.TECHNIQUE:
+            trace.fired.append("yuta_copy")
+            copied_card = CardInstance(card_templates[card.id], cost=int(card.cost * 1.25), is_copied=True)
+            target.discard(copied_card)
+            game.game_log.append(f"Юта Оккоцу скопировал {card.name}!")
+
+        # Sukuna Passive (Energy)
+        if target.character and target.character.id == "sukuna_ryomen" and \
+           source and source.character and source.hp and target.hp and \
+           (source.hp / source.max_hp) > (target.hp / target.max_hp):
+            trace.fired.append("sukuna_energy")
+            restore_amount = int(target.character.max_energy * 0.05)
+            target.energy = min(target.character.max_energy, target.energy + restore_amount)
+            game.game_log.append(f"Жажда Развлечений дарует {target.nickname} {restore_amount} ПЭ!")
+
+        if self.sets_burn:
+            trace.fired.append("jogo_burn")
+            existing_burn = target.get_effect(EFFECT_ID_BURN)
+            if existing_burn:
+                existing_burn.duration = balance.BURN_DURATION
+                game.game_log.append(f"Эффект 'Горение' на {target.nickname} обновлён.")
+            else:
+                self.gm._apply_effect(game, source, target, EFFECT_ID_BURN, balance.BURN_DURATION, value=balance.BURN_DAMAGE)
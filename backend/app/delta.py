@@ -0,0 +1,96 @@
+from typing import Any, Dict, Optional
+
+from .models import Game
+from .views import view_cache
+from .websockets import broadcast_each
+
+PLAYERS_FIELD = "players"
+# log entries sent along with a full snapshot, older ones are paged over REST
+SNAPSHOT_LOG_TAIL = 50
+
+
+def _diff_player(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in new.items() if old.get(k) != v}
+
+
+def diff_game(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Builds a game_delta payload that turns the `old` game view into `new`.
+    Log entries are not part of the views and are added by the caller."""
+    delta: Dict[str, Any] = {
+        "game_id": new["game_id"],
+        "base_version": old["version"],
+        "version": new["version"],
+    }
+
+    changes = {
+        k: v for k, v in new.items()
+        if k not in (PLAYERS_FIELD, "version") and old.get(k) != v
+    }
+    if changes:
+        delta["changes"] = changes
+
+    old_players = {p["id"]: p for p in old[PLAYERS_FIELD]}
+    new_order = [p["id"] for p in new[PLAYERS_FIELD]]
+    player_changes = {}
+    for p in new[PLAYERS_FIELD]:
+        prev = old_players.get(p["id"])
+        changed = p if prev is None else _diff_player(prev, p)
+        if changed:
+            player_changes[p["id"]] = changed
+    if player_changes:
+        delta["players"] = player_changes
+    # Players were added, removed or reordered (dummies, training reorder)
+    if new_order != list(old_players):
+        delta["player_order"] = new_order
+
+    return delta
+
+
+class DeltaTracker:
+    """Remembers the last game view sent to every recipient so the next
+    broadcast only has to carry what changed for them since then."""
+
+    def __init__(self):
+        # game_id -> {viewer_id: last view sent}
+        self._last_sent: Dict[str, Dict[Optional[str], Dict[str, Any]]] = {}
+
+    def snapshot_message(self, game: Game, viewer_id: Optional[str], log_since: Optional[int] = None) -> dict:
+        """Full `game_state` message, e.g. for a reconnecting client or a sync request.
+
+        Carries the log entries from `log_since` on, or the last SNAPSHOT_LOG_TAIL
+        entries if the client has none yet.
+        """
+        view = view_cache.get(game, viewer_id)
+        self._last_sent.setdefault(game.game_id, {})[viewer_id] = view
+        if log_since is None:
+            log = game.game_log.page(limit=SNAPSHOT_LOG_TAIL)
+        else:
+            log = game.game_log.since(log_since)
+        return {"type": "game_state", "payload": {**view, "game_log": log}}
+
+    def broadcast_message(self, game: Game, viewer_id: Optional[str]) -> dict:
+        """Message to send after a command: a `game_delta` against the previous
+        view sent to `viewer_id`, or a full `game_state` if there was none."""
+        sent = self._last_sent.setdefault(game.game_id, {})
+        prev = sent.get(viewer_id)
+        if prev is None:
+            return self.snapshot_message(game, viewer_id)
+        view = view_cache.get(game, viewer_id)
+        sent[viewer_id] = view
+        delta = diff_game(prev, view)
+        if view["log_seq"] != prev["log_seq"]:
+            delta["log_append"] = game.game_log.since(prev["log_seq"])
+        return {"type": "game_delta", "payload": delta}
+
+    def forget(self, game_id: str):
+        self._last_sent.pop(game_id, None)
+        view_cache.forget(game_id)
+
+
+delta_tracker = DeltaTracker()
+
+
+async def broadcast_game(lobby_id: str, game: Game):
+    """Sends every player in the lobby their own view of `game`."""
+    if game:
+        await broadcast_each(lobby_id, lambda pid: delta_tracker.broadcast_message(game, pid))
@@ -0,0 +1,231 @@
+"""Append-only log of accepted game commands, one file per game.
+
+A file is a sequence of records, each a 9-byte header (kind, game version,
+payload length) followed by an orjson payload:
+
+    SEED      {"game_id": ..., "seed": ...}    first record of every file
+    KEYFRAME  snapshot.game_to_dict(game)      at the start, every KEYFRAME_INTERVAL
+                                               commands, when the game ends, when
+                                               it is restored from a snapshot and
+                                               when it is resumed after a restart
+    COMMAND   [name, *args]                    a GameManager command, after it was
+                                               applied; version is the game version
+                                               it produced
+
+A game at any version is the last keyframe at or before that version with
+the commands after it replayed on top, see GameManager.rebuild_game.
+
+Records are written behind, like in the state store: they are buffered per
+game and every FLUSH_INTERVAL seconds the buffers are appended to their
+files on a background thread; reads flush first. EVENT_LOG=off turns the log
+off, and prune() (run by the janitor) deletes the logs of games that ended
+long ago.
+"""
+import asyncio
+import os
+import struct
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Set, Tuple
+
+import orjson
+
+from .models import Game, GameState
+from .snapshot import game_to_dict, game_from_dict
+
+EVENT_LOG = os.environ.get("EVENT_LOG", "on") != "off"
+EVENT_LOG_DIR = os.environ.get("EVENT_LOG_DIR", "data/events")
+KEYFRAME_INTERVAL = 100
+FLUSH_INTERVAL = 0.1 # seconds
+
+SEED, KEYFRAME, COMMAND = 1, 2, 3
+_HEADER = struct.Struct("<BII")
+
+
+class EventLog:
+    def __init__(self, directory: str = EVENT_LOG_DIR, keyframe_interval: int = KEYFRAME_INTERVAL,
+                 flush_interval: float = FLUSH_INTERVAL):
+        self.directory = directory
+        self.keyframe_interval = keyframe_interval
+        self.flush_interval = flush_interval
+        os.makedirs(directory, exist_ok=True)
+        # game_id -> commands written since the last keyframe, for the games being logged
+        self._since_keyframe: Dict[str, int] = {}
+        # game_id -> records not written yet; logs in _fresh replace the file
+        self._pending: Dict[str, bytearray] = {}
+        self._fresh: Set[str] = set()
+        # all the file access happens on this one thread, in order
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix="event-log")
+        self._task: asyncio.Task | None = None
+
+    def path(self, game_id: str) -> str:
+        return os.path.join(self.directory, f"{game_id}.events")
+
+    def _write(self, game_id: str, kind: int, version: int, payload: Any):
+        data = orjson.dumps(payload)
+        pending = self._pending.setdefault(game_id, bytearray())
+        pending += _HEADER.pack(kind, version, len(data))
+        pending += data
+
+    def _keyframe(self, game: Game):
+        self._write(game.game_id, KEYFRAME, game.version, game_to_dict(game))
+        self._since_keyframe[game.game_id] = 0
+
+    def start(self, game: Game):
+        """Starts the log of a freshly created game, replacing any old one."""
+        self.close(game.game_id)
+        self._pending.pop(game.game_id, None)
+        self._fresh.add(game.game_id)
+        self._write(game.game_id, SEED, game.version, {"game_id": game.game_id, "seed": game.seed})
+        self._keyframe(game)
+
+    def resume(self, game: Game):
+        """Continues the log of a game loaded from the state store after a
+        restart, see GameManager.resume_game."""
+        self.flush().result()
+        if not os.path.exists(self.path(game.game_id)):
+            self.start(game)
+            return
+        self._keyframe(game)
+
+    def record(self, game: Game, command: str, args: Tuple[Any, ...]):
+        """Appends a command that has just been applied to `game`."""
+        if game.game_id not in self._since_keyframe:
+            return
+        self._write(game.game_id, COMMAND, game.version, [command, *args])
+        self._since_keyframe[game.game_id] += 1
+        if game.game_state == GameState.FINISHED:
+            self._keyframe(game)
+            self.close(game.game_id)
+        elif self._since_keyframe[game.game_id] >= self.keyframe_interval:
+            self._keyframe(game)
+
+    def restored(self, game: Game):
+        """Records that `game` was reset to a snapshot (GameManager.restore);
+        commands can't replay that, so it is written as a keyframe."""
+        if game.game_id not in self._since_keyframe:
+            return
+        self._keyframe(game)
+
+    def close(self, game_id: str):
+        """Stops logging the game; what it recorded is still written."""
+        self._since_keyframe.pop(game_id, None)
+
+    # --- Writing ---
+
+    def flush(self) -> Future:
+        """Hands the buffered records to the writer thread; the future is
+        done once they are in the files."""
+        pending, self._pending = self._pending, {}
+        fresh, self._fresh = self._fresh, set()
+        return self._writer.submit(self._append, pending, fresh)
+
+    def _append(self, pending: Dict[str, bytearray], fresh: Set[str]):
+        for game_id, data in pending.items():
+            with open(self.path(game_id), "wb" if game_id in fresh else "ab") as f:
+                f.write(data)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self._pending:
+                try:
+                    await asyncio.wrap_future(self.flush())
+                except OSError as e:
+                    print(f"Event log write failed: {e!r}")
+
+    def start_writer(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def close_all(self):
+        """Stops logging every game and writes what is still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._since_keyframe.clear()
+        self.flush().result()
+        self._writer.shutdown(wait=True)
+
+    def prune(self, max_age: float) -> Future:
+        """Deletes the logs of games not being logged that haven't been
+        written for `max_age` seconds; the future gives how many."""
+        cutoff = time.time() - max_age
+        keep = set(self._since_keyframe) | set(self._pending)
+        return self._writer.submit(self._prune, cutoff, keep)
+
+    def _prune(self, cutoff: float, keep: Set[str]) -> int:
+        pruned = 0
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                game_id, ext = os.path.splitext(entry.name)
+                if ext != ".events" or game_id in keep or entry.stat().st_mtime >= cutoff:
+                    continue
+                try:
+                    os.remove(entry.path)
+                    pruned += 1
+                except FileNotFoundError:
+                    pass
+        return pruned
+
+    # --- Reading ---
+
+    def _records(self, f: BinaryIO, read_payload) -> Iterator[Tuple[int, int, int, Optional[bytes]]]:
+        """(kind, version, offset, payload) for every record from the current
+        position; the payload is only read if read_payload(kind, version)."""
+        while True:
+            offset = f.tell()
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                return
+            kind, version, length = _HEADER.unpack(header)
+            if read_payload(kind, version):
+                payload = f.read(length)
+                if len(payload) < length:
+                    return # torn write at the end of the file
+                yield kind, version, offset, payload
+            else:
+                f.seek(length, os.SEEK_CUR)
+                yield kind, version, offset, None
+
+    def read(self, game_id: str, version: Optional[int] = None) -> Tuple[Game, List[Tuple[str, List[Any]]]]:
+        """The last keyframe at or before `version` (the latest one if None) and
+        the commands recorded after it, up to `version`."""
+        self.flush().result()
+        with open(self.path(game_id), "rb") as f:
+            keyframe_offset = None
+            for kind, v, offset, _ in self._records(f, lambda kind, v: False):
+                if kind == KEYFRAME and (version is None or v <= version):
+                    keyframe_offset = offset
+            if keyframe_offset is None:
+                raise LookupError(f"No keyframe for game {game_id} at version {version}.")
+
+            f.seek(keyframe_offset)
+            records = self._records(f, lambda kind, v: version is None or v <= version)
+            _, _, _, payload = next(records)
+            game = game_from_dict(orjson.loads(payload))
+            commands = []
+            for kind, v, _, payload in records:
+                if payload is None:
+                    break
+                if kind == COMMAND:
+                    name, *args = orjson.loads(payload)
+                    commands.append((name, args))
+            return game, commands
+
+    def last_version(self, game_id: str) -> Optional[int]:
+        """Version of the last record, None if the game has no log."""
+        self.flush().result()
+        if not os.path.exists(self.path(game_id)):
+            return None
+        with open(self.path(game_id), "rb") as f:
+            last = None
+            for _, version, _, _ in self._records(f, lambda kind, v: False):
+                last = version
+            return last
+
+    def seed(self, game_id: str) -> int:
+        self.flush().result()
+        with open(self.path(game_id), "rb") as f:
+            kind, _, _, payload = next(self._records(f, lambda kind, v: True))
+            return orjson.loads(payload)["seed"]
@@ -0,0 +1,145 @@
+"""Periodic clean-up of state nobody will use again.
+
+Every SWEEP_INTERVAL seconds the janitor
+    drops games finished more than FINISHED_GAME_TTL seconds ago; the event
+        log (and the sqlite state store, if used) keep them as the archive
+    closes lobbies that haven't changed for IDLE_LOBBY_TTL seconds, telling
+        the sockets still in them (lobby_closed) before closing those
+    removes empty lobby rooms and connections whose socket is closed or in
+        no room
+    deletes the archive of games not changed for ARCHIVE_TTL seconds: their
+        event logs and state store rows
+
+and prints what it removed. The size given for the dropped games and
+lobbies is the size of their snapshots (snapshot.py), not of the memory
+they held.
+
+In sharded mode every process runs its own janitor over its own state: the
+shards over games and lobbies, the web process over the sockets.
+"""
+import asyncio
+import os
+import time
+from typing import Dict
+
+import orjson
+from starlette.websockets import WebSocketState
+
+from . import lobby, websockets
+from .delta import delta_tracker
+from .game import game_manager
+from .lobby import lobby_manager
+from .models import GameState
+from .snapshot import dump_game, lobby_to_dict
+
+FINISHED_GAME_TTL = float(os.environ.get("FINISHED_GAME_TTL", "600")) # seconds
+IDLE_LOBBY_TTL = float(os.environ.get("IDLE_LOBBY_TTL", "3600"))
+SWEEP_INTERVAL = float(os.environ.get("SWEEP_INTERVAL", "60"))
+ARCHIVE_TTL = float(os.environ.get("ARCHIVE_TTL", str(7 * 24 * 3600)))
+
+
+def counts() -> Dict[str, int]:
+    """What this process holds right now."""
+    return {
+        "games": len(game_manager.games),
+        "lobbies": len(lobby.lobbies),
+        "lobby_rooms": len(websockets.lobby_rooms),
+        "connections": len(websockets.connections),
+    }
+
+
+class Janitor:
+    def __init__(self, finished_game_ttl: float = FINISHED_GAME_TTL, idle_lobby_ttl: float = IDLE_LOBBY_TTL,
+                 interval: float = SWEEP_INTERVAL, archive_ttl: float = ARCHIVE_TTL):
+        self.finished_game_ttl = finished_game_ttl
+        self.idle_lobby_ttl = idle_lobby_ttl
+        self.archive_ttl = archive_ttl
+        self.interval = interval
+        # game id -> when a sweep first saw it finished
+        self._finished_since: Dict[str, float] = {}
+        self.last_sweep: Dict[str, int] = {}
+        self._task: asyncio.Task | None = None
+
+    def _sweep_games(self, now: float, report: Dict[str, int]):
+        for game_id in list(self._finished_since):
+            if game_id not in game_manager.games:
+                del self._finished_since[game_id]
+        for game_id, game in list(game_manager.games.items()):
+            if game.game_state != GameState.FINISHED:
+                continue
+            if now - self._finished_since.setdefault(game_id, now) < self.finished_game_ttl:
+                continue
+            report["snapshot_bytes"] += len(dump_game(game))
+            game_manager.drop_game(game_id)
+            delta_tracker.forget(game_id)
+            del self._finished_since[game_id]
+            report["games_dropped"] += 1
+
+    async def _sweep_lobbies(self, now: float, report: Dict[str, int]):
+        for lobby_id, kept in list(lobby.lobbies.items()):
+            # lobbies loaded by the state store count from their first sweep
+            if now - lobby.last_activity.setdefault(lobby_id, now) < self.idle_lobby_ttl:
+                continue
+            report["snapshot_bytes"] += len(orjson.dumps(lobby_to_dict(kept)))
+            lobby_manager.close_lobby(lobby_id)
+            await websockets.close_room(lobby_id, {"type": "lobby_closed", "payload": {"lobby_id": lobby_id, "reason": "idle"}})
+            report["lobbies_closed"] += 1
+
+    async def _sweep_sockets(self, report: Dict[str, int]):
+        for lobby_id, room in list(websockets.lobby_rooms.items()):
+            if not room:
+                del websockets.lobby_rooms[lobby_id]
+                report["rooms_removed"] += 1
+        in_rooms = set().union(*websockets.lobby_rooms.values())
+        for player_id, ws in list(websockets.connections.items()):
+            connected = ws.application_state == WebSocketState.CONNECTED and ws.client_state == WebSocketState.CONNECTED
+            if connected and player_id in in_rooms:
+                continue
+            del websockets.connections[player_id]
+            if connected:
+                try:
+                    await asyncio.wait_for(ws.close(), websockets.SEND_TIMEOUT)
+                except Exception:
+                    pass
+            report["connections_removed"] += 1
+
+    async def _sweep_archive(self, report: Dict[str, int]):
+        if game_manager.event_log:
+            report["logs_pruned"] = await asyncio.wrap_future(game_manager.event_log.prune(self.archive_ttl))
+        if game_manager.store:
+            report["archived_games_pruned"] = await game_manager.store.prune(self.archive_ttl)
+
+    async def sweep(self) -> Dict[str, int]:
+        report = dict.fromkeys(("games_dropped", "lobbies_closed", "rooms_removed", "connections_removed", "logs_pruned", "archived_games_pruned", "snapshot_bytes"), 0)
+        now = time.monotonic()
+        self._sweep_games(now, report)
+        await self._sweep_lobbies(now, report)
+        await self._sweep_sockets(report)
+        await self._sweep_archive(report)
+        self.last_sweep = report
+        if any(report.values()):
+            print(f"Janitor: dropped {report['games_dropped']} games, closed {report['lobbies_closed']} lobbies, "
+                  f"removed {report['rooms_removed']} rooms and {report['connections_removed']} connections, "
+                  f"pruned {report['logs_pruned']} event logs and {report['archived_games_pruned']} archived games; "
+                  f"the dropped games and lobbies are {report['snapshot_bytes'] / 1024:.1f} KB as snapshots; now {counts()}")
+        return report
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"Janitor sweep failed: {e!r}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+janitor = Janitor()
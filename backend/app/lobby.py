@@ -1,28 +1,40 @@
-import string, random
-from typing import Dict
+import string, random, asyncio, uuid, time
+from typing import Callable, Dict
 
 from .models import Lobby, Player, Game
 from .exceptions import LobbyNotFound, CharacterAlreadyTaken, PlayerNotFound, CharacterNotFound, LobbyException
-from .content import characters
+from .content import characters, characters_by_id
 from .game import game_manager
 from .websockets import broadcast
+from .delta import broadcast_game
+from .bots import BOT_ID_PREFIX, is_bot, run_bots
 
 # In-memory storage for lobbies
 lobbies: Dict[str, Lobby] = {}
+# lobby id -> time.monotonic() of its last change, see janitor.py
+last_activity: Dict[str, float] = {}
+# an engine shard only creates lobbies it owns, see shards.py
+owns_lobby_id: Callable[[str], bool] = lambda lobby_id: True
 
 def _generate_lobby_id():
     """Generates a unique 6-digit alphanumeric lobby code."""
     while True:
         lobby_id = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-        if lobby_id not in lobbies:
+        if lobby_id not in lobbies and owns_lobby_id(lobby_id):
             return lobby_id
 
+def _changed(lobby: Lobby):
+    last_activity[lobby.id] = time.monotonic()
+    if game_manager.store:
+        game_manager.store.save_lobby(lobby)
+
 class LobbyManager:
     async def create_lobby(self, host_id: str, nickname: str, is_training: bool = False) -> Lobby:
         lobby_id = _generate_lobby_id()
         host = Player(id=host_id, nickname=nickname)
         lobby = Lobby(id=lobby_id, host_id=host_id, players=[host], is_training=is_training)
         lobbies[lobby_id] = lobby
+        _changed(lobby)
         return lobby
 
     def get_lobby(self, lobby_id: str) -> Lobby | None:
@@ -39,6 +51,7 @@ class LobbyManager:
         new_player = Player(id=player_id, nickname=nickname)
         lobby.players.append(new_player)
         
+        _changed(lobby)
         await broadcast(lobby_id, {"type": "lobby_update", "payload": lobby.dict()})
         return lobby
 
@@ -56,7 +69,7 @@ class LobbyManager:
         if not player:
             raise PlayerNotFound(f"Player with id {player_id} not found in lobby {lobby_id}.")
 
-        character_template = next((c for c in characters if c.id == character_id), None)
+        character_template = characters_by_id.get(character_id)
         if not character_template:
             raise CharacterNotFound(f"Character with id {character_id} not found.")
 
@@ -65,6 +78,7 @@ class LobbyManager:
         player.max_hp = character_template.max_hp
         player.energy = character_template.max_energy
         
+        _changed(lobby)
         await broadcast(lobby_id, {"type": "lobby_update", "payload": lobby.dict()})
         return lobby
         
@@ -84,13 +98,52 @@ class LobbyManager:
         game = await game_manager.start_game_and_watcher(lobby)
         
         # Notify all players in the lobby that the game is starting
-        await broadcast(lobby_id, {"type": "game_state", "payload": game.dict()})
+        await broadcast_game(lobby_id, game)
+        if any(is_bot(p.id) for p in game.players):
+            asyncio.create_task(run_bots(lobby_id, game.game_id))
         
         # Clean up lobby
-        del lobbies[lobby_id]
+        self.close_lobby(lobby_id)
         
         return game
 
+    def close_lobby(self, lobby_id: str):
+        lobbies.pop(lobby_id, None)
+        last_activity.pop(lobby_id, None)
+        if game_manager.store:
+            game_manager.store.delete_lobby(lobby_id)
+
+    async def add_bot(self, lobby_id: str, host_id: str) -> Lobby:
+        lobby = self.get_lobby(lobby_id)
+        if not lobby:
+            raise LobbyNotFound(f"Lobby with id {lobby_id} not found.")
+
+        if lobby.host_id != host_id:
+            raise LobbyException("Только хост может добавлять ботов.")
+
+        if len(lobby.players) >= 8:
+            raise LobbyException("Lobby is full.")
+
+        taken = {p.character.id for p in lobby.players if p.character}
+        free = [c for c in characters if c.id not in taken]
+        if not free:
+            raise LobbyException("Не осталось свободных персонажей.")
+
+        character = random.choice(free)
+        bot = Player(
+            id=f"{BOT_ID_PREFIX}{uuid.uuid4().hex[:8]}",
+            nickname=f"Бот ({character.name})",
+            character=character,
+            hp=character.max_hp,
+            max_hp=character.max_hp,
+            energy=character.max_energy,
+        )
+        lobby.players.append(bot)
+
+        _changed(lobby)
+        await broadcast(lobby_id, {"type": "lobby_update", "payload": lobby.dict()})
+        return lobby
+
     async def kick_player(self, lobby_id: str, host_id: str, player_to_kick_id: str) -> Lobby:
         lobby = self.get_lobby(lobby_id)
         if not lobby:
@@ -108,6 +161,7 @@ class LobbyManager:
         
         lobby.players.remove(player_to_kick)
         
+        _changed(lobby)
         await broadcast(lobby_id, {"type": "lobby_update", "payload": lobby.dict()})
         await broadcast(lobby_id, {"type": "player_kicked", "payload": {"kicked_player_id": player_to_kick_id, "kicked_player_nickname": player_to_kick.nickname}})
         
@@ -1,5 +1,10 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel
+from typing import Any, Collection, Deque, Dict, List, Optional, Tuple
+from collections import Counter, deque
+from dataclasses import dataclass, field, fields
+from functools import cache
+import itertools
+import random
 from enum import Enum
 from datetime import datetime
 
@@ -10,11 +15,56 @@ class Rarity(str, Enum):
     EPIC = "Эпическая"
     LEGENDARY = "Легендарная"
 
-class Effect(BaseModel):
+# Engine state (Effect, Player, Lobby, GameLog, Game) is kept in plain slotted
+# dataclasses: no validation on construction and cheap attribute access.
+# It is converted to JSON-ready dicts with .dict() only when it leaves the
+# engine (websocket messages, see views.py; REST responses, see schemas.py).
+
+class _State:
+    __slots__ = ()
+
+    def dict(self, exclude: Collection[str] = ()) -> Dict[str, Any]:
+        return {name: _dump(getattr(self, name)) for name in state_fields(type(self)) if name not in exclude}
+
+@cache
+def state_fields(cls) -> Tuple[str, ...]:
+    return tuple(f.name for f in fields(cls) if not f.name.startswith("_"))
+
+def _copy(obj: _State) -> Any:
+    """Shallow copy of a slotted state object, faster than copy.copy."""
+    cls = type(obj)
+    new = object.__new__(cls)
+    for name in cls.__slots__:
+        setattr(new, name, getattr(obj, name))
+    return new
+
+def _copy_counter(counter: Counter) -> Counter:
+    # Counter.copy goes through Counter.update, several times slower
+    new = Counter()
+    dict.update(new, counter)
+    return new
+
+def _dump(value: Any) -> Any:
+    if isinstance(value, Enum):
+        return value.value
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    if isinstance(value, (_State, CardInstance)):
+        return value.dict()
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (list, tuple, deque)):
+        return [_dump(v) for v in value]
+    return value
+
+@dataclass(slots=True, kw_only=True, eq=False)
+class Effect(_State):
     name: str
     duration: int # in rounds
     value: Optional[int] = None # e.g., for damage over time
-    source_player_id: str 
+    source_player_id: str
     target_id: Optional[str] = None
 
 class PlayerStatus(str, Enum):
@@ -38,6 +88,48 @@ class Card(BaseModel):
     duration: Optional[int] = None # For domain expansions
     is_copied: bool = False
 
+_card_uids = itertools.count(1)
+
+class CardInstance:
+    """A card in a hand, deck or discard pile.
+
+    Shares the immutable template (name, description, ...) and only stores
+    what may differ per instance: a cost override and the `is_copied` flag.
+    """
+    __slots__ = ("template", "uid", "cost_override", "is_copied")
+
+    def __init__(self, template: Card, cost: Optional[int] = None, is_copied: bool = False):
+        self.template = template
+        self.uid = next(_card_uids)
+        self.cost_override = cost
+        self.is_copied = is_copied
+
+    id = property(lambda self: self.template.id)
+    name = property(lambda self: self.template.name)
+    type = property(lambda self: self.template.type)
+    rarity = property(lambda self: self.template.rarity)
+    description = property(lambda self: self.template.description)
+    source_player_id = property(lambda self: self.template.source_player_id)
+    duration = property(lambda self: self.template.duration)
+
+    @property
+    def cost(self) -> int:
+        return self.template.cost if self.cost_override is None else self.cost_override
+
+    def copy(self) -> "CardInstance":
+        return CardInstance(self.template, self.cost_override, self.is_copied)
+
+    def dict(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {"id": self.id, "uid": self.uid}
+        if self.cost_override is not None:
+            data["cost"] = self.cost_override
+        if self.is_copied:
+            data["is_copied"] = True
+        return data
+
+    def __repr__(self):
+        return f"CardInstance({self.id!r}, uid={self.uid})"
+
 class Character(BaseModel):
     id: str
     name: str
@@ -47,7 +139,8 @@ class Character(BaseModel):
     passive_ability_description: str
     unique_cards: List[Card]
 
-class Player(BaseModel):
+@dataclass(slots=True, kw_only=True, eq=False)
+class Player(_State):
     id: str  # Session ID will be used here
     nickname: str
     character: Optional[Character] = None
@@ -55,10 +148,10 @@ class Player(BaseModel):
     max_hp: Optional[int] = None # For dummies mostly
     energy: Optional[int] = None
     block: int = 0
-    hand: List[Card] = []
-    deck: List[Card] = []
-    discard_pile: List[Card] = []
-    effects: List[Effect] = []
+    hand: List[CardInstance] = field(default_factory=list)
+    deck: List[CardInstance] = field(default_factory=list)
+    discard_pile: List[CardInstance] = field(default_factory=list)
+    effects: List[Effect] = field(default_factory=list)
     status: PlayerStatus = PlayerStatus.ALIVE
     last_discard_round: int = 0  # раунд, когда игрок последний раз использовал сброс
     # Gojo's state for "Purple"
@@ -76,27 +169,279 @@ class Player(BaseModel):
     distorted_souls: int = 0
     mahito_turn_counter: int = 0
 
-    def dict(self, **kwargs):
-        return self.model_dump(**kwargs)
+    # effect name -> effects with that name, in the order they were applied.
+    # Always change effects through the methods below so it stays in sync.
+    _effect_index: Dict[str, List[Effect]] = field(default_factory=dict, init=False, repr=False)
+    # card type -> number of such cards in the deck / discard pile.
+    # Always change the piles through the methods below so they stay in sync.
+    _deck_types: Counter = field(default_factory=Counter, init=False, repr=False)
+    _discard_types: Counter = field(default_factory=Counter, init=False, repr=False)
+
+    def __post_init__(self):
+        for effect in self.effects:
+            self._effect_index.setdefault(effect.name, []).append(effect)
+        self._deck_types.update(c.type for c in self.deck)
+        self._discard_types.update(c.type for c in self.discard_pile)
+
+    def add_effect(self, effect: Effect):
+        self.effects.append(effect)
+        self._effect_index.setdefault(effect.name, []).append(effect)
+
+    def get_effect(self, name: str, source_player_id: Optional[str] = None) -> Effect | None:
+        """First effect called `name` (applied by `source_player_id`, if given)."""
+        for effect in self._effect_index.get(name, ()):
+            if source_player_id is None or effect.source_player_id == source_player_id:
+                return effect
+        return None
+
+    def has_effect(self, name: str, source_player_id: Optional[str] = None) -> bool:
+        return self.get_effect(name, source_player_id) is not None
+
+    def remove_effect(self, effect: Effect):
+        same_name = self._effect_index.get(effect.name, [])
+        for i, e in enumerate(same_name):
+            if e is effect:
+                del same_name[i]
+                break
+        else:
+            return
+        if not same_name:
+            del self._effect_index[effect.name]
+        for i, e in enumerate(self.effects):
+            if e is effect:
+                del self.effects[i]
+                break
+
+    def remove_effects_by_name(self, *names: str):
+        if not any(name in self._effect_index for name in names):
+            return
+        for name in names:
+            self._effect_index.pop(name, None)
+        self.effects[:] = [e for e in self.effects if e.name not in names]
+
+    # --- Draw pile ---
+
+    def set_deck(self, cards: List[CardInstance]):
+        self.deck = cards
+        self._deck_types = Counter(c.type for c in cards)
+
+    def deck_count(self, card_type: CardType) -> int:
+        return self._deck_types[card_type]
+
+    def discard_count(self, card_type: CardType) -> int:
+        return self._discard_types[card_type]
+
+    def discard(self, card: CardInstance):
+        self.discard_pile.append(card)
+        self._discard_types[card.type] += 1
+
+    def take_from_deck(self, index: int = 0) -> CardInstance:
+        card = self.deck.pop(index)
+        self._deck_types[card.type] -= 1
+        return card
 
-class Lobby(BaseModel):
+    def reshuffle_discard(self, rng: random.Random):
+        """Shuffles the discard pile and puts it under the deck."""
+        pile = self.discard_pile
+        self.discard_pile = []
+        rng.shuffle(pile)
+        self.deck.extend(pile)
+        self._deck_types.update(self._discard_types)
+        self._discard_types = Counter()
+
+    def clone(self) -> "Player":
+        """Independent copy for search and what-if play. Card instances are
+        never changed in place, so the piles share them with the original."""
+        p = _copy(self)
+        p.hand = self.hand[:]
+        p.deck = self.deck[:]
+        p.discard_pile = self.discard_pile[:]
+        p.effects = [_copy(e) for e in self.effects]
+        p._effect_index = {}
+        for effect in p.effects:
+            p._effect_index.setdefault(effect.name, []).append(effect)
+        p._deck_types = _copy_counter(self._deck_types)
+        p._discard_types = _copy_counter(self._discard_types)
+        return p
+
+@dataclass(slots=True, kw_only=True, eq=False)
+class Lobby(_State):
     id: str
     host_id: str
-    players: List[Player] = []
+    players: List[Player] = field(default_factory=list)
     is_training: bool = False
-    
+
 class GameState(str, Enum):
     LOBBY = "LOBBY"
     IN_GAME = "IN_GAME"
     FINISHED = "FINISHED"
 
-class Game(BaseModel):
+GAME_LOG_CAPACITY = 500
+
+@dataclass(slots=True, kw_only=True, eq=False)
+class GameLog(_State):
+    """Bounded game log. Keeps the last `capacity` entries as (seq, text)
+    pairs; seq grows monotonically and is never reused."""
+    capacity: int = GAME_LOG_CAPACITY
+    next_seq: int = 0
+    entries: Deque[Tuple[int, str]] = field(default_factory=deque)
+
+    def append(self, text: str):
+        if len(self.entries) >= self.capacity:
+            self.entries.popleft()
+        self.entries.append((self.next_seq, text))
+        self.next_seq += 1
+
+    def since(self, seq: int) -> List[Tuple[int, str]]:
+        """Entries with seq >= `seq` that are still retained."""
+        start = max(0, len(self.entries) - (self.next_seq - seq))
+        return list(itertools.islice(self.entries, start, None))
+
+    def page(self, before: Optional[int] = None, limit: int = 50) -> List[Tuple[int, str]]:
+        """Up to `limit` entries older than `before` (newest entries if None), oldest first."""
+        end = len(self.entries) if before is None else max(0, len(self.entries) - (self.next_seq - before))
+        return list(itertools.islice(self.entries, max(0, end - limit), end))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clone(self) -> "GameLog":
+        return GameLog(capacity=self.capacity, next_seq=self.next_seq, entries=self.entries.copy())
+
+@dataclass(slots=True, kw_only=True, eq=False)
+class Game(_State):
     game_id: str
     players: List[Player]
     current_turn_player_index: int = 0
     round_number: int = 1
     game_state: GameState = GameState.IN_GAME
     active_domain: Optional[Card] = None
-    game_log: List[str] = []
+    game_log: GameLog = field(default_factory=GameLog)
     is_training: bool = False
     turn_start_time: datetime | None = None
+    version: int = 0 # bumped on every accepted command, used by game_delta
+    seed: int = 0 # seeds the game's RNG, never sent to clients
+
+    # all randomness of the game comes from here, see `rng`
+    _rng: random.Random = field(default_factory=random.Random, init=False, repr=False)
+
+    # id -> player and seat; the alive players form a circular list in seat
+    # order (id -> next/previous alive id). Add, remove or reorder players and
+    # defeat them only through the methods below so these stay in sync.
+    _players_by_id: Dict[str, Player] = field(default_factory=dict, init=False, repr=False)
+    _seats: Dict[str, int] = field(default_factory=dict, init=False, repr=False)
+    _next_alive: Dict[str, str] = field(default_factory=dict, init=False, repr=False)
+    _prev_alive: Dict[str, str] = field(default_factory=dict, init=False, repr=False)
+    # defeated id -> the player that was next alive when it was defeated
+    _successors: Dict[str, str] = field(default_factory=dict, init=False, repr=False)
+
+    def __post_init__(self):
+        self._rng.seed(self.seed)
+        self.reindex_players()
+
+    @property
+    def rng(self) -> random.Random:
+        return self._rng
+
+    def clone(self, seed: Optional[int] = None) -> "Game":
+        """Independent copy of the whole engine state that plays on exactly
+        like the original. Much cheaper than a snapshot round trip: nothing
+        is serialized and cards are shared. With `seed` the copy gets a fresh
+        RNG instead of the original's state (search must not see the real
+        future rolls, and copying the state is the slowest part)."""
+        g = _copy(self)
+        g.players = [p.clone() for p in self.players]
+        g.game_log = self.game_log.clone()
+        if seed is None:
+            g._rng = random.Random()
+            g._rng.setstate(self._rng.getstate())
+        else:
+            g._rng = random.Random(seed)
+        g._players_by_id = {p.id: p for p in g.players}
+        g._seats = self._seats.copy()
+        g._next_alive = self._next_alive.copy()
+        g._prev_alive = self._prev_alive.copy()
+        g._successors = self._successors.copy()
+        return g
+
+    def assign(self, other: "Game"):
+        """Turns this game into `other` in place, so references to it held
+        elsewhere stay valid. `other` must not be used afterwards."""
+        for name in Game.__slots__:
+            setattr(self, name, getattr(other, name))
+
+    def reindex_players(self):
+        """Rebuilds the indices from `players`, e.g. after they were reordered."""
+        self._players_by_id = {p.id: p for p in self.players}
+        self._seats = {p.id: i for i, p in enumerate(self.players)}
+        alive = [p.id for p in self.players if p.status == PlayerStatus.ALIVE]
+        self._next_alive = {pid: alive[(i + 1) % len(alive)] for i, pid in enumerate(alive)}
+        self._prev_alive = {pid: alive[i - 1] for i, pid in enumerate(alive)}
+        self._successors = {}
+        if alive:
+            n = len(self.players)
+            for seat, p in enumerate(self.players):
+                if p.status != PlayerStatus.ALIVE:
+                    self._successors[p.id] = next(
+                        q.id for q in (self.players[(seat + step) % n] for step in range(1, n))
+                        if q.status == PlayerStatus.ALIVE
+                    )
+
+    def add_player(self, player: Player):
+        self.players.append(player)
+        self.reindex_players()
+
+    def remove_player(self, player: Player):
+        self.players.remove(player)
+        self.reindex_players()
+
+    def move_to_front(self, player: Player):
+        self.players.remove(player)
+        self.players.insert(0, player)
+        self.reindex_players()
+
+    def defeat(self, player: Player):
+        player.status = PlayerStatus.DEFEATED
+        nxt = self._next_alive.pop(player.id, None)
+        if nxt is None:
+            return
+        prev = self._prev_alive.pop(player.id)
+        self._successors[player.id] = nxt
+        if nxt != player.id:
+            self._next_alive[prev] = nxt
+            self._prev_alive[nxt] = prev
+
+    def player(self, player_id: str) -> Player | None:
+        return self._players_by_id.get(player_id)
+
+    def seat(self, player_id: str) -> int:
+        return self._seats.get(player_id, -1)
+
+    @property
+    def alive_count(self) -> int:
+        return len(self._next_alive)
+
+    def alive_players(self) -> List[Player]:
+        """Alive players in no particular order."""
+        return [self._players_by_id[pid] for pid in self._next_alive]
+
+    def left_of(self, player: Player) -> Player | None:
+        """Previous alive player in seat order (the player itself if it is the
+        only one alive), None if `player` is defeated."""
+        pid = self._prev_alive.get(player.id)
+        return self._players_by_id[pid] if pid is not None else None
+
+    def right_of(self, player: Player) -> Player | None:
+        pid = self._next_alive.get(player.id)
+        return self._players_by_id[pid] if pid is not None else None
+
+    def next_alive_after(self, player: Player) -> Player | None:
+        """First alive player after `player`'s seat, `player` itself included
+        if it is the only one alive; None if everybody is defeated."""
+        if not self._next_alive:
+            return None
+        pid = player.id
+        # a defeated player's successor may have been defeated since too
+        while pid not in self._next_alive:
+            pid = self._successors[pid]
+        return self.right_of(self._players_by_id[pid]) if pid == player.id else self._players_by_id[pid]
@@ -0,0 +1,141 @@
+"""Vectorized Monte Carlo estimates of the random card mechanics.
+
+Every function simulates `trials` independent runs at once as NumPy arrays,
+using the numbers from balance.py that the engine itself uses:
+
+    python -m app.montecarlo --attacker itadori_yuji --defender gojo_satoru
+
+The model is one attacker against one defender without block or defensive
+effects; the attacker plays the card once per turn.
+"""
+import argparse
+from typing import Dict, Optional
+
+import numpy as np
+import orjson
+
+from . import balance
+from .content import characters_by_id
+
+DEFAULT_TRIALS = 100_000
+DEFAULT_TURNS = 20
+
+
+def _rng(rng: Optional[np.random.Generator]) -> np.random.Generator:
+    return rng if rng is not None else np.random.default_rng()
+
+
+def black_flash(trials: int, character_id: str, turns: int = 1, chant: bool = False,
+                rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """Damage of playing Black Flash once per turn, shape (trials, turns).
+    A hit grants Zone, which raises the chance and the damage of the
+    following plays while it lasts."""
+    rng = _rng(rng)
+    is_itadori = character_id == "itadori_yuji"
+    chance = balance.BLACK_FLASH_CHANCE_ITADORI if is_itadori else balance.BLACK_FLASH_CHANCE
+    zone_chance = balance.BLACK_FLASH_CHANCE_ITADORI_ZONE if is_itadori else balance.BLACK_FLASH_CHANCE_ZONE
+
+    rolls = rng.integers(1, balance.BLACK_FLASH_DIE + 1, size=(trials, turns))
+    zone_left = np.zeros(trials, dtype=np.int64)
+    damage = np.empty((trials, turns), dtype=np.int64)
+    for t in range(turns):
+        if t:
+            np.maximum(zone_left - 1, 0, out=zone_left) # Zone ticks down at the start of the turn
+        zone = zone_left > 0
+        hit = rolls[:, t] <= np.where(zone, zone_chance, chance)
+        dealt = np.where(hit, balance.BLACK_FLASH_HIT_DAMAGE, balance.BLACK_FLASH_MISS_DAMAGE)
+        dealt = np.where(zone, np.floor(dealt * balance.ZONE_TECHNIQUE_MULTIPLIER), dealt).astype(np.int64)
+        if chant:
+            dealt = np.floor(dealt * balance.CHANT_MULTIPLIER).astype(np.int64)
+        damage[:, t] = dealt
+        zone_left[hit] = balance.ZONE_DURATION
+    return damage
+
+
+def burn(hits: np.ndarray) -> np.ndarray:
+    """Jogo's burn damage on the defender for every turn, given whether
+    Jogo landed a technique on them that turn (bool array (trials, turns)).
+    A hit sets the burn to BURN_DURATION ticks; it ticks at the start of
+    the defender's following turns."""
+    trials, turns = hits.shape
+    burn_left = np.zeros(trials, dtype=np.int64)
+    damage = np.zeros((trials, turns), dtype=np.int64)
+    for t in range(turns):
+        burn_left[hits[:, t]] = balance.BURN_DURATION
+        ticking = burn_left > 0
+        damage[ticking, t] = balance.BURN_DAMAGE
+        burn_left[ticking] -= 1
+    return damage
+
+
+def concentration(trials: int, character_id: str, rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """Energy restored by one Concentration."""
+    low, high = balance.CONCENTRATION_PERCENT
+    percent = _rng(rng).integers(low, high + 1, size=trials) / 100
+    return np.floor(characters_by_id[character_id].max_energy * percent).astype(np.int64)
+
+
+def reverse_cursed_technique(trials: int, character_id: str, rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """HP healed by one Reverse Cursed Technique."""
+    low, high = balance.RCT_HEAL_PERCENT
+    percent = _rng(rng).integers(low, high + 1, size=trials) / 100
+    return np.floor(characters_by_id[character_id].max_hp * percent).astype(np.int64)
+
+
+def kill_turns(damage: np.ndarray, hp: int) -> np.ndarray:
+    """1-based turn on which the cumulative damage reaches `hp`, 0 if it never does."""
+    dead = np.cumsum(damage, axis=1) >= hp
+    return np.where(dead.any(axis=1), dead.argmax(axis=1) + 1, 0)
+
+
+def describe(samples: np.ndarray) -> Dict[str, float]:
+    p10, p50, p90 = np.percentile(samples, [10, 50, 90])
+    return {"mean": float(samples.mean()), "std": float(samples.std()), "p10": float(p10), "p50": float(p50), "p90": float(p90)}
+
+
+def _kill_turn_distribution(turns: np.ndarray, max_turns: int) -> Dict[str, float]:
+    counts = np.bincount(turns, minlength=max_turns + 1)
+    dist = {str(t): counts[t] / len(turns) for t in range(1, max_turns + 1) if counts[t]}
+    dist["never"] = counts[0] / len(turns)
+    return dist
+
+
+def report(attacker_id: str, defender_id: str, trials: int = DEFAULT_TRIALS, turns: int = DEFAULT_TURNS,
+           seed: Optional[int] = None) -> dict:
+    rng = np.random.default_rng(seed)
+    defender_hp = characters_by_id[defender_id].max_hp
+
+    bf = black_flash(trials, attacker_id, turns, rng=rng)
+    if attacker_id == "jogo":
+        # Black Flash is a technique, so every play also sets Jogo's burn
+        bf = bf + burn(np.ones_like(bf, dtype=bool))
+    bf_kill = kill_turns(bf, defender_hp)
+
+    return {
+        "attacker": attacker_id,
+        "defender": defender_id,
+        "trials": trials,
+        "black_flash": {
+            "first_play": describe(bf[:, 0]),
+            "per_turn": describe(bf.mean(axis=1)),
+            "kill_turn": _kill_turn_distribution(bf_kill, turns),
+        },
+        "concentration": describe(concentration(trials, attacker_id, rng)),
+        "reverse_cursed_technique": describe(reverse_cursed_technique(trials, attacker_id, rng)),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.montecarlo", description=__doc__.splitlines()[0])
+    parser.add_argument("--attacker", required=True, choices=list(characters_by_id))
+    parser.add_argument("--defender", required=True, choices=list(characters_by_id))
+    parser.add_argument("--trials", type=int, default=DEFAULT_TRIALS)
+    parser.add_argument("--turns", type=int, default=DEFAULT_TURNS)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+    result = report(args.attacker, args.defender, args.trials, args.turns, args.seed)
+    print(orjson.dumps(result, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY).decode())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Which cards a player may play right now.
+
+GameManager.play_card enforces these rules; the views send the result to
+every player along with their hand (see views.render_player) so clients know
+what is playable without trying, and bots search over legal_moves.
+"""
+import itertools
+from typing import Any, Dict, List, Optional, Tuple
+
+from .models import Game, Player, CardInstance, CardType, GameState, PlayerStatus, Rarity
+from .content import (
+    card_meta, EFFECT_ID_UNLIMITED_VOID, EFFECT_ID_FREE_STRIKE,
+    CONDITION_BLUE_AND_RED, CONDITION_BLACK_FLASH, CONDITION_LOW_HP,
+)
+from .exceptions import GameException
+
+# play_card arguments after the player: (card_id, target_id, targets_ids)
+Move = Tuple[str, Optional[str], Optional[List[str]]]
+
+
+def is_free_strike(player: Player, card: CardInstance) -> bool:
+    return card.id == "common_strike" and player.has_effect(EFFECT_ID_FREE_STRIKE)
+
+
+def card_cost(player: Player, card: CardInstance) -> int:
+    """Energy `player` pays for `card`, before a free strike."""
+    cost = card.cost
+    # Apply Gojo's discount
+    if player.character and player.character.id == "gojo_satoru":
+        cost = int(cost * player.cost_modifier)
+
+    # Apply Yuta's domain discount
+    if card.is_copied and player.has_effect("yuta_true_mutual_love"):
+        cost = -(-cost // 4) # Ceiling division
+    return cost
+
+
+def check_play(game: Game, player: Player, card: CardInstance, cost: int, free_strike: bool):
+    """Raises GameException if `player` may not play `card` now. Whose turn
+    it is and whether the card is in hand is checked by the caller."""
+    meta = card_meta[card.id]
+    if not game.is_training:
+        if not free_strike and player.energy < cost:
+            raise GameException("Недостаточно Проклятой Энергии.")
+
+    # --- Card specific cost checks ---
+    if meta.soul_cost:
+        if player.distorted_souls < meta.soul_cost: raise GameException("Недостаточно Искажённых Душ.")
+
+    # --- Conditional Cards ---
+    if meta.condition == CONDITION_BLUE_AND_RED:
+        if not player.has_effect("gojo_blue_effect") or not player.has_effect("gojo_red_effect"):
+            raise GameException("Нужно сначала использовать 'Синий' и 'Красный'.")
+
+    if meta.condition == CONDITION_BLACK_FLASH:
+        if not player.successful_black_flash:
+            raise GameException(f"Нужно сначала успешно использовать 'Чёрную Вспышку'.")
+
+    if meta.condition == CONDITION_LOW_HP:
+        if player.hp > player.character.max_hp * 0.33:
+            raise GameException("Можно использовать только если ХП меньше или равно 33%.")
+
+    # --- Domain Expansion Effects ---
+    if player.has_effect(EFFECT_ID_UNLIMITED_VOID):
+        if card.type == CardType.TECHNIQUE or card.rarity in [Rarity.EPIC, Rarity.LEGENDARY]:
+            raise GameException("Вы не можете использовать эту карту из-за 'Информационной перегрузки'.")
+
+
+def playable_cards(game: Game, player: Player) -> Dict[str, Dict[str, Any]]:
+    """card id -> {"cost", and "targets" / "target_count" if the card takes
+    targets} for every card in hand `player` may play now; empty when it is
+    not their turn. Targets are the alive opponents, a multi-target card
+    takes target_count of them, repeats allowed."""
+    if game.game_state == GameState.FINISHED or game.players[game.current_turn_player_index].id != player.id:
+        return {}
+    opponents = None
+    playable = {}
+    for card in player.hand:
+        if card.id in playable: continue # play_card always takes the first copy
+        free_strike = is_free_strike(player, card)
+        cost = card_cost(player, card)
+        try:
+            check_play(game, player, card, cost, free_strike)
+        except GameException:
+            continue
+        entry: Dict[str, Any] = {"cost": 0 if free_strike else cost}
+        meta = card_meta[card.id]
+        if meta.needs_target or meta.target_count:
+            if opponents is None:
+                opponents = [p.id for p in game.players if p.id != player.id and p.status == PlayerStatus.ALIVE]
+            entry["targets"] = opponents
+            if meta.target_count:
+                entry["target_count"] = meta.target_count
+        playable[card.id] = entry
+    return playable
+
+
+def legal_moves(game: Game, player_id: str) -> List[Move]:
+    """Every move play_card would accept from `player_id` now, one per
+    playable card and choice of targets."""
+    player = game.player(player_id)
+    if not player:
+        return []
+    moves: List[Move] = []
+    for card_id, entry in playable_cards(game, player).items():
+        if "target_count" in entry:
+            moves.extend((card_id, None, list(ids)) for ids in itertools.combinations_with_replacement(entry["targets"], entry["target_count"]))
+        elif "targets" in entry:
+            moves.extend((card_id, target_id, None) for target_id in entry["targets"])
+        else:
+            moves.append((card_id, None, None))
+    return moves
@@ -1,34 +1,29 @@
-from pydantic import BaseModel
-from typing import List, Optional
-from .models import Card, Character, Rarity, CardType, PlayerStatus, GameState
-from datetime import datetime
+from pydantic import BaseModel, ConfigDict
+from typing import List, Optional, Tuple
+from .models import Card, Character, Rarity, CardType, PlayerStatus
 
 # --- Schemas for Player and Lobby Management ---
 
 class PlayerCreate(BaseModel):
     nickname: str
 
+# Engine state (models.Lobby/Game) is read with from_attributes,
+# e.g. LobbyInfo.model_validate(lobby)
+
 class PlayerInfo(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: str
     nickname: str
     character: Optional[Character] = None
-    game_state: GameState
-    game_log: list[str]
-    round_number: int
-    is_training: bool
-    turn_start_time: datetime | None = None
-
-    class Config:
-        orm_mode = True
 
 class LobbyInfo(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: str
     host_id: str
     players: List[PlayerInfo]
 
-    class Config:
-        orm_mode = True
-
 class LobbyJoinResponse(BaseModel):
     lobby_info: LobbyInfo
     player_id: str
@@ -37,6 +32,9 @@ class CharacterSelectRequest(BaseModel):
     player_id: str
     character_id: str
 
+class AddBotRequest(BaseModel):
+    host_id: str
+
 class KickPlayerRequest(BaseModel):
     host_id: str
     player_to_kick_id: str
@@ -44,13 +42,17 @@ class KickPlayerRequest(BaseModel):
 # --- Schemas for Game State ---
 
 class GameStateInfo(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     game_id: str
     players: List[PlayerInfo]
     current_turn_player_index: int
     round_number: int
     active_domain: Optional[Card] = None
     game_state: str
-    game_log: List[str]
+    version: int
 
-    class Config:
-        orm_mode = True
+class GameLogPage(BaseModel):
+    entries: List[Tuple[int, str]] # (seq, text), oldest first
+    first_seq: Optional[int] = None # oldest entry the server still keeps
+    next_seq: int
@@ -0,0 +1,413 @@
+"""Hosting the games in several engine processes.
+
+With ENGINE_SHARDS=N (N > 0) the server starts N engine processes, each with
+its own lobbies, games, turn timers and bots; with the sqlite state store
+they share the database and each loads its own games at startup. A lobby and the game started
+from it live on shard shard_for(lobby id). The web process only keeps the
+sockets: REST calls and websocket messages become ops (see OPS) sent to the
+owning shard over a Unix socket, and a shard publishes the messages for a
+lobby's players back to the web process, which sends them (see
+websockets.publisher).
+
+A frame on the socket is a 4-byte length followed by an orjson payload:
+
+    {"id", "op", "args"}                 web -> shard
+    {"id", "result"} / {"id", "error", "message"}   shard -> web, the reply
+    {"publish": lobby_id, "texts": {player id: text}}  shard -> web
+
+With ENGINE_SHARDS=0, the default, everything runs in this process and call()
+runs the ops directly.
+"""
+import asyncio
+import itertools
+import multiprocessing
+import os
+import shutil
+import struct
+import tempfile
+import zlib
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import orjson
+
+from . import bots, exceptions, janitor, lobby, websockets
+from .delta import delta_tracker
+from .eventlog import EventLog, EVENT_LOG
+from .game import game_manager, game_id_for_lobby, lobby_id_for_game
+from .lobby import lobby_manager
+from .schemas import LobbyInfo, GameStateInfo, GameLogPage
+from .timers import DeadlineScheduler
+from .store import open_store
+
+ENGINE_SHARDS = int(os.environ.get("ENGINE_SHARDS", "0"))
+# seconds a shard process may take to start listening, to answer a call,
+# and to exit
+SHARD_START_TIMEOUT = 30.0
+SHARD_CALL_TIMEOUT = 30.0
+SHARD_STOP_TIMEOUT = 30.0
+
+_LENGTH = struct.Struct("<I")
+
+
+def shard_for(key: str, count: int) -> int:
+    """Shard of a lobby or of the game started from it."""
+    return zlib.crc32(lobby_id_for_game(key).encode()) % count
+
+
+# --- The engine ---
+
+def start_engine():
+    if EVENT_LOG:
+        game_manager.event_log = EventLog()
+        game_manager.event_log.start_writer()
+    game_manager.turn_timers = DeadlineScheduler(game_manager.on_turn_deadline)
+    game_manager.turn_timers.start()
+    game_manager.store = open_store()
+    _load_state()
+    game_manager.store.start()
+
+
+def _load_state():
+    """Picks up the lobbies and games of this shard kept by the store."""
+    lobbies, games = game_manager.store.load()
+    for kept in lobbies:
+        if lobby.owns_lobby_id(kept.id):
+            lobby.lobbies[kept.id] = kept
+    for game in games:
+        lobby_id = lobby_id_for_game(game.game_id)
+        if not lobby.owns_lobby_id(lobby_id):
+            continue
+        game_manager.resume_game(game)
+        if any(bots.is_bot(p.id) for p in game.players):
+            asyncio.create_task(bots.run_bots(lobby_id, game.game_id))
+    if lobbies or games:
+        print(f"Loaded {len(lobby.lobbies)} lobbies and {len(game_manager.games)} games.")
+
+
+def stop_engine(wait: bool = False):
+    game_manager.turn_timers.stop()
+    game_manager.store.close()
+    if game_manager.event_log:
+        game_manager.event_log.close_all()
+    bots.shutdown(wait)
+
+
+def _lobby_info(lobby) -> Optional[dict]:
+    return LobbyInfo.model_validate(lobby).model_dump(mode="json") if lobby else None
+
+
+async def _create_lobby(host_id: str, nickname: str, is_training: bool = False):
+    return _lobby_info(await lobby_manager.create_lobby(host_id, nickname, is_training))
+
+async def _get_lobby(lobby_id: str):
+    return _lobby_info(lobby_manager.get_lobby(lobby_id))
+
+async def _join_lobby(lobby_id: str, player_id: str, nickname: str):
+    return _lobby_info(await lobby_manager.join_lobby(lobby_id, player_id, nickname))
+
+async def _select_character(lobby_id: str, player_id: str, character_id: str):
+    return _lobby_info(await lobby_manager.select_character(lobby_id, player_id, character_id))
+
+async def _add_bot(lobby_id: str, host_id: str):
+    return _lobby_info(await lobby_manager.add_bot(lobby_id, host_id))
+
+async def _kick_player(lobby_id: str, host_id: str, player_to_kick_id: str):
+    return _lobby_info(await lobby_manager.kick_player(lobby_id, host_id, player_to_kick_id))
+
+async def _start_game(lobby_id: str, player_id: str):
+    game = await lobby_manager.start_game(lobby_id, player_id)
+    return GameStateInfo.model_validate(game).model_dump(mode="json")
+
+async def _game_log(game_id: str, before: Optional[int], limit: int):
+    game = game_manager.get_game(game_id)
+    if not game: return None
+    log = game.game_log
+    return GameLogPage(
+        entries=log.page(before, limit),
+        first_seq=log.entries[0][0] if log.entries else None,
+        next_seq=log.next_seq,
+    ).model_dump(mode="json")
+
+async def _connect(lobby_id: str, player_id: str) -> List[dict]:
+    """Joins the lobby's room; returns the messages a new socket starts with."""
+    websockets.lobby_rooms.setdefault(lobby_id, set()).add(player_id)
+    messages = []
+    lobby = lobby_manager.get_lobby(lobby_id)
+    if lobby:
+        messages.append({"type": "lobby_update", "payload": lobby.dict()})
+    # при переподключении к идущей игре отдаём полный снапшот
+    game = game_manager.get_game(game_id_for_lobby(lobby_id))
+    if game:
+        messages.append(delta_tracker.snapshot_message(game, player_id))
+    return messages
+
+async def _disconnect(lobby_id: str, player_id: str):
+    room = websockets.lobby_rooms.get(lobby_id)
+    if room is not None:
+        room.discard(player_id)
+
+async def _command(lobby_id: str, game_id: str, command: str, *args):
+    # applied in the game's queue, which also broadcasts the result
+    await game_manager.actors.submit(lobby_id, game_id, command, *args)
+
+async def _sync(game_id: str, player_id: str, log_since: Optional[int]):
+    game = game_manager.get_game(game_id)
+    return delta_tracker.snapshot_message(game, player_id, log_since) if game else None
+
+async def _stats():
+    return {
+        **janitor.counts(),
+        "game_actors": len(game_manager.actors),
+        "pending_turn_deadlines": game_manager.turn_timers.pending if game_manager.turn_timers else 0,
+    }
+
+OPS: Dict[str, Callable[..., Awaitable[Any]]] = {
+    "create_lobby": _create_lobby,
+    "get_lobby": _get_lobby,
+    "join_lobby": _join_lobby,
+    "select_character": _select_character,
+    "add_bot": _add_bot,
+    "kick_player": _kick_player,
+    "start_game": _start_game,
+    "game_log": _game_log,
+    "connect": _connect,
+    "disconnect": _disconnect,
+    "command": _command,
+    "sync": _sync,
+    "stats": _stats,
+}
+
+
+# --- IPC ---
+
+def _send(writer: asyncio.StreamWriter, message: dict):
+    data = orjson.dumps(message)
+    writer.write(_LENGTH.pack(len(data)) + data)
+
+async def _receive(reader: asyncio.StreamReader) -> Optional[dict]:
+    try:
+        size, = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+        return orjson.loads(await reader.readexactly(size))
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return None
+
+
+async def _run_op(writer: asyncio.StreamWriter, request: dict):
+    try:
+        result = await OPS[request["op"]](*request["args"])
+    except Exception as e:
+        _send(writer, {"id": request["id"], "error": type(e).__name__, "message": str(e)})
+    else:
+        _send(writer, {"id": request["id"], "result": result})
+
+
+async def _serve(index: int, count: int, path: str):
+    lobby.owns_lobby_id = lambda lobby_id: shard_for(lobby_id, count) == index
+    # the bot workers of all shards share the cores
+    bots.BOT_WORKERS = max(1, bots.BOT_WORKERS // count)
+    start_engine()
+    janitor.janitor.start()
+    closed = asyncio.Event()
+
+    async def session(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        async def publish(lobby_id: str, texts: Dict[str, str], close: bool):
+            _send(writer, {"publish": lobby_id, "texts": texts, "close": close})
+        websockets.publisher = publish
+        tasks = set()
+        while (request := await _receive(reader)) is not None:
+            task = asyncio.create_task(_run_op(writer, request))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        closed.set() # the web process is gone
+
+    server = await asyncio.start_unix_server(session, path)
+    async with server:
+        await closed.wait()
+    janitor.janitor.stop()
+    # a process started by multiprocessing hangs on exit if its bot workers are still running
+    stop_engine(wait=True)
+
+
+def serve(index: int, count: int, path: str):
+    """Entry point of an engine shard process."""
+    asyncio.run(_serve(index, count, path))
+
+
+class _Shard:
+    def __init__(self, index: int, count: int, path: str):
+        self.index = index
+        self.path = path
+        # spawn: forking the running server would copy its sockets and threads.
+        # Not a daemon, it has bot workers of its own; it exits when the
+        # connection to the web process closes.
+        self.process = multiprocessing.get_context("spawn").Process(target=serve, args=(index, count, path))
+        self.reader: asyncio.StreamReader | None = None
+        self.writer: asyncio.StreamWriter | None = None
+        self.pending: Dict[int, asyncio.Future] = {}
+        self.ids = itertools.count()
+        # lobby id -> its last delivery, so a lobby gets its messages in order
+        self.deliveries: Dict[str, asyncio.Task] = {}
+        self.task: asyncio.Task | None = None
+        self.stopping = False
+        # set once the connection is gone, calls fail right away after that
+        self.dead = False
+
+    async def start(self):
+        self.process.start()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + SHARD_START_TIMEOUT
+        while True:
+            try:
+                self.reader, self.writer = await asyncio.open_unix_connection(self.path)
+                break
+            except (FileNotFoundError, ConnectionRefusedError):
+                if loop.time() > deadline or not self.process.is_alive():
+                    raise RuntimeError(f"Engine shard {self.index} did not start.")
+                await asyncio.sleep(0.05)
+        self.task = asyncio.create_task(self._read())
+
+    async def call(self, op: str, args: tuple) -> Any:
+        """Raises ConnectionError if the shard is gone and TimeoutError if it
+        doesn't answer in SHARD_CALL_TIMEOUT."""
+        if self.dead:
+            raise ConnectionError(f"Engine shard {self.index} is gone.")
+        request_id = next(self.ids)
+        future = self.pending[request_id] = asyncio.get_running_loop().create_future()
+        _send(self.writer, {"id": request_id, "op": op, "args": args})
+        try:
+            return await asyncio.wait_for(future, SHARD_CALL_TIMEOUT)
+        finally:
+            self.pending.pop(request_id, None)
+
+    async def _read(self):
+        while (message := await _receive(self.reader)) is not None:
+            if "publish" in message:
+                self._publish(message["publish"], message["texts"], message["close"])
+                continue
+            future = self.pending.pop(message["id"], None)
+            if future is None or future.done():
+                continue
+            if "error" in message:
+                error = getattr(exceptions, message["error"], None)
+                if not (isinstance(error, type) and issubclass(error, Exception)):
+                    error = RuntimeError
+                future.set_exception(error(message["message"]))
+            else:
+                future.set_result(message["result"])
+        self.dead = True
+        if not self.stopping:
+            print(f"Engine shard {self.index} closed the connection.")
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError(f"Engine shard {self.index} is gone."))
+        self.pending.clear()
+
+    def _publish(self, lobby_id: str, texts: Dict[str, str], close: bool):
+        task = asyncio.create_task(self._deliver(self.deliveries.get(lobby_id), lobby_id, texts, close))
+        self.deliveries[lobby_id] = task
+        task.add_done_callback(lambda t: self.deliveries.get(lobby_id) is t and self.deliveries.pop(lobby_id))
+
+    async def _deliver(self, previous: asyncio.Task | None, lobby_id: str, texts: Dict[str, str], close: bool):
+        if previous:
+            await asyncio.wait([previous])
+        failed = await websockets.deliver(lobby_id, texts)
+        if close:
+            # the shard has already closed the lobby and forgotten the room
+            await websockets.drop_room(lobby_id)
+            return
+        try:
+            for player_id in failed:
+                await self.call("disconnect", (lobby_id, player_id))
+        except (ConnectionError, asyncio.TimeoutError) as e:
+            print(f"Engine shard {self.index} missed a disconnect: {e!r}")
+
+    async def stop(self):
+        self.stopping = True
+        if self.writer:
+            self.writer.close()
+        if self.task:
+            await self.task
+        # the shard stops its bot workers before it exits
+        await asyncio.get_running_loop().run_in_executor(None, self.process.join, SHARD_STOP_TIMEOUT)
+        if self.process.is_alive():
+            self.process.terminate()
+
+
+_shards: List[_Shard] = []
+_socket_dir: str | None = None
+
+
+async def start():
+    """Starts the engine: in this process, or ENGINE_SHARDS shard processes."""
+    janitor.janitor.start()
+    if not ENGINE_SHARDS:
+        start_engine()
+        return
+    global _socket_dir
+    _socket_dir = tempfile.mkdtemp(prefix="jjk-shards-")
+    _shards.extend(_Shard(i, ENGINE_SHARDS, os.path.join(_socket_dir, f"shard{i}.sock")) for i in range(ENGINE_SHARDS))
+    await asyncio.gather(*(shard.start() for shard in _shards))
+
+
+async def stop():
+    janitor.janitor.stop()
+    if not _shards:
+        stop_engine()
+        return
+    await asyncio.gather(*(shard.stop() for shard in _shards))
+    _shards.clear()
+    shutil.rmtree(_socket_dir, ignore_errors=True)
+
+
+async def call(key: str, op: str, *args) -> Any:
+    """Runs OPS[op](*args) on the shard owning the lobby or game `key`."""
+    if not _shards:
+        return await OPS[op](*args)
+    return await _shards[shard_for(key, len(_shards))].call(op, args)
+
+
+async def stats() -> Dict[str, int]:
+    """stats op summed over all the shards, with the sockets of this process;
+    shards that are gone or don't answer are counted in shards_down."""
+    if not _shards:
+        return {**await _stats(), "last_sweep": janitor.janitor.last_sweep}
+    total: Dict[str, int] = {"shards_down": 0}
+    for result in await asyncio.gather(*(shard.call("stats", ()) for shard in _shards), return_exceptions=True):
+        if isinstance(result, (ConnectionError, asyncio.TimeoutError)):
+            total["shards_down"] += 1
+            continue
+        if isinstance(result, BaseException):
+            raise result
+        for name, value in result.items():
+            total[name] = total.get(name, 0) + value
+    # the sockets are in this process, the shards only mirror the rooms
+    total.update({name: value for name, value in janitor.counts().items() if name in ("lobby_rooms", "connections")})
+    total["shards"] = len(_shards)
+    return total
+
+
+class ShardedLobbyManager:
+    """LobbyManager's API for the web process, forwarded to the shards. The
+    lobbies come back as LobbyInfo / GameStateInfo dicts."""
+
+    async def create_lobby(self, host_id: str, nickname: str, is_training: bool = False) -> dict:
+        # the shard picks an id it owns, any shard will do
+        return await call(host_id, "create_lobby", host_id, nickname, is_training)
+
+    async def join_lobby(self, lobby_id: str, player_id: str, nickname: str) -> dict:
+        return await call(lobby_id, "join_lobby", lobby_id, player_id, nickname)
+
+    async def select_character(self, lobby_id: str, player_id: str, character_id: str) -> dict:
+        return await call(lobby_id, "select_character", lobby_id, player_id, character_id)
+
+    async def start_game(self, lobby_id: str, player_id: str) -> dict:
+        return await call(lobby_id, "start_game", lobby_id, player_id)
+
+    async def add_bot(self, lobby_id: str, host_id: str) -> dict:
+        return await call(lobby_id, "add_bot", lobby_id, host_id)
+
+    async def kick_player(self, lobby_id: str, host_id: str, player_to_kick_id: str) -> dict:
+        return await call(lobby_id, "kick_player", lobby_id, host_id, player_to_kick_id)
+
+
+sharded_lobby_manager = ShardedLobbyManager()
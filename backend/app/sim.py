@@ -0,0 +1,269 @@
+"""Headless batch simulation: plays games between bots without the server.
+
+    python -m app.sim --games 100000 --characters gojo_satoru,sukuna_ryomen --agents greedy,random
+
+Games run in a process pool on all cores; one JSON line per game is
+streamed to --out as soon as it finishes, and a summary (win rate per
+character, average length, damage by the card or effect that dealt it) is
+printed at the end.
+"""
+import argparse
+import multiprocessing
+from abc import ABC, abstractmethod
+import os
+import random
+import sys
+import time
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Sequence, Set
+
+import orjson
+
+from .models import Game, Lobby, Player, PlayerStatus, GameState
+from .content import characters, characters_by_id, card_meta
+from .exceptions import GameException
+from .game import GameManager
+from .rules import Move
+from . import bots, rules
+
+MAX_ROUNDS = 100
+# safety net against agents that keep picking cards the engine accepts forever
+MAX_PLAYS_PER_TURN = 30
+
+
+# --- Agents ---
+
+class Agent(ABC):
+    """Picks the next card to play for `player`, or None to end the turn.
+    Cards in `rejected` were refused by the engine earlier this turn."""
+    name = ""
+
+    @abstractmethod
+    def choose(self, game: Game, player: Player, rejected: Set[str], rng: random.Random) -> Move | None:
+        ...
+
+
+def _opponents(game: Game, player: Player) -> List[Player]:
+    return [p for p in game.players if p.id != player.id and p.status == PlayerStatus.ALIVE]
+
+
+def _move(card_id: str, targets: List[Player]) -> Move:
+    count = card_meta[card_id].target_count
+    if count:
+        return card_id, None, [targets[i % len(targets)].id for i in range(count)]
+    return card_id, targets[0].id, None
+
+
+class RandomAgent(Agent):
+    """Plays random cards at random opponents and ends the turn at random."""
+    name = "random"
+    end_turn_chance = 0.15
+
+    def choose(self, game, player, rejected, rng):
+        cards = [c.id for c in player.hand if c.id not in rejected]
+        opponents = _opponents(game, player)
+        if not cards or not opponents or rng.random() < self.end_turn_chance:
+            return None
+        targets = opponents[:]
+        rng.shuffle(targets)
+        return _move(rng.choice(cards), targets)
+
+
+class GreedyAgent(Agent):
+    """Plays the most expensive card it can afford at the weakest opponents."""
+    name = "greedy"
+
+    def choose(self, game, player, rejected, rng):
+        opponents = _opponents(game, player)
+        if not opponents:
+            return None
+        playable = {card_id: entry["cost"] for card_id, entry in rules.playable_cards(game, player).items() if card_id not in rejected}
+        if not playable:
+            return None
+        card_id = max(playable, key=playable.get)
+        return _move(card_id, sorted(opponents, key=lambda p: p.hp))
+
+
+class MctsAgent(Agent):
+    """The server's bot (bots.search) with a short budget per move."""
+    name = "mcts"
+    budget = 0.2
+
+    def choose(self, game, player, rejected, rng):
+        move = bots.search(game, player.id, self.budget, rng.getrandbits(64))
+        if move is None or move[0] in rejected:
+            return None
+        return move
+
+
+AGENTS: Dict[str, type] = {a.name: a for a in (RandomAgent, GreedyAgent, MctsAgent)}
+
+
+# --- Running games ---
+
+def play_game(index: int, seed: int, character_ids: Sequence[str], agent_names: Sequence[str], max_rounds: int = MAX_ROUNDS) -> dict:
+    """Plays one game to the end and returns its result line."""
+    gm = GameManager()
+    players = []
+    for i, character_id in enumerate(character_ids):
+        ch = characters_by_id[character_id]
+        players.append(Player(id=f"p{i}", nickname=f"{agent_names[i]}:{ch.id}", character=ch, hp=ch.max_hp, max_hp=ch.max_hp, energy=ch.max_energy))
+    lobby = Lobby(id=f"sim_{index}", host_id="p0", players=players)
+    game = gm._create_game_from_lobby(lobby, seed=seed)
+    gm.games[game.game_id] = game
+    # every hit, including the ones at the end and start of a turn, is
+    # credited to its Hit.cause; hits without one to the card being played
+    gm.damage_trace = []
+
+    agents = {p.id: AGENTS[agent_names[i]]() for i, p in enumerate(players)}
+    rng = random.Random(seed ^ 0x5EED)
+    damage_by_card: Counter = Counter()
+    error = None
+
+    try:
+        while game.game_state != GameState.FINISHED and game.round_number <= max_rounds:
+            player = game.players[game.current_turn_player_index]
+            agent = agents[player.id]
+            rejected: Set[str] = set()
+            for _ in range(MAX_PLAYS_PER_TURN):
+                move = agent.choose(game, player, rejected, rng)
+                if move is None:
+                    break
+                card_id, target_id, targets_ids = move
+                try:
+                    gm.play_card(game.game_id, player.id, card_id, target_id, targets_ids)
+                except GameException:
+                    rejected.add(card_id)
+                    continue
+                finally:
+                    _credit_damage(gm, damage_by_card, card_id)
+                if game.game_state == GameState.FINISHED:
+                    break
+            if game.game_state != GameState.FINISHED:
+                gm.end_turn(game.game_id, player.id)
+                _credit_damage(gm, damage_by_card, None)
+    except Exception as e: # engine bugs should not stop the whole batch
+        error = f"{type(e).__name__}: {e}"
+
+    winner = None
+    if game.game_state == GameState.FINISHED:
+        alive = game.alive_players()
+        winner = alive[0] if alive else None
+    return {
+        "game": index,
+        "seed": seed,
+        "characters": list(character_ids),
+        "agents": list(agent_names),
+        "winner": winner.character.id if winner else None,
+        "winner_agent": agents[winner.id].name if winner else None,
+        "rounds": game.round_number,
+        "damage_by_card": dict(damage_by_card),
+        "error": error,
+    }
+
+
+def _credit_damage(gm: GameManager, damage_by_card: Counter, card_id: Optional[str]):
+    for hit in gm.damage_trace:
+        cause = hit.cause or card_id
+        if cause and hit.dealt > 0:
+            damage_by_card[cause] += hit.dealt
+    gm.damage_trace.clear()
+
+
+def _play_game(spec: tuple) -> dict:
+    return play_game(*spec)
+
+
+def game_specs(games: int, seed: int, character_ids: Optional[List[str]], players: int,
+               agent_names: List[str], max_rounds: int) -> Iterator[tuple]:
+    """Arguments of play_game for every game of the batch. Without a fixed
+    matchup every game gets `players` random distinct characters."""
+    rng = random.Random(seed)
+    all_ids = [ch.id for ch in characters]
+    for i in range(games):
+        matchup = character_ids or rng.sample(all_ids, players)
+        agents = [agent_names[j % len(agent_names)] for j in range(len(matchup))]
+        yield i, rng.getrandbits(64), matchup, agents, max_rounds
+
+
+class Summary:
+    def __init__(self):
+        self.games = 0
+        self.errors = 0
+        self.draws = 0
+        self.rounds = 0
+        self.played: Counter = Counter()
+        self.wins: Counter = Counter()
+        self.agent_wins: Counter = Counter()
+        self.damage_by_card: Counter = Counter()
+
+    def add(self, result: dict):
+        self.games += 1
+        if result["error"]:
+            self.errors += 1
+            return
+        self.rounds += result["rounds"]
+        self.played.update(result["characters"])
+        if result["winner"]:
+            self.wins[result["winner"]] += 1
+            self.agent_wins[result["winner_agent"]] += 1
+        else:
+            self.draws += 1
+        self.damage_by_card.update(result["damage_by_card"])
+
+    def as_dict(self) -> dict:
+        finished = self.games - self.errors
+        return {
+            "games": self.games,
+            "errors": self.errors,
+            "draws": self.draws,
+            "avg_rounds": round(self.rounds / finished, 2) if finished else None,
+            "win_rate": {ch: round(self.wins[ch] / n, 4) for ch, n in self.played.most_common()},
+            "agent_wins": dict(self.agent_wins),
+            "damage_by_card": dict(self.damage_by_card.most_common()),
+        }
+
+
+def run(specs: Iterator[tuple], out_path: str, workers: int, chunksize: int = 64) -> Summary:
+    summary = Summary()
+    with open(out_path, "wb") as out, multiprocessing.Pool(workers) as pool:
+        for result in pool.imap_unordered(_play_game, specs, chunksize):
+            out.write(orjson.dumps(result) + b"\n")
+            summary.add(result)
+    return summary
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m app.sim", description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--characters", help="comma-separated character ids of a fixed matchup")
+    parser.add_argument("--players", type=int, default=2, help="players per game without --characters")
+    parser.add_argument("--agents", default="greedy", help=f"comma-separated, assigned to seats in turn: {', '.join(AGENTS)}")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-rounds", type=int, default=MAX_ROUNDS)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--out", default="sim_results.jsonl")
+    args = parser.parse_args(argv)
+
+    character_ids = args.characters.split(",") if args.characters else None
+    for character_id in character_ids or ():
+        if character_id not in characters_by_id:
+            parser.error(f"unknown character: {character_id}")
+    agent_names = args.agents.split(",")
+    for name in agent_names:
+        if name not in AGENTS:
+            parser.error(f"unknown agent: {name}")
+    if not character_ids and not 2 <= args.players <= len(characters):
+        parser.error(f"--players must be between 2 and {len(characters)}")
+
+    started = time.perf_counter()
+    specs = game_specs(args.games, args.seed, character_ids, args.players, agent_names, args.max_rounds)
+    summary = run(specs, args.out, args.workers)
+    elapsed = time.perf_counter() - started
+
+    sys.stdout.write(orjson.dumps(summary.as_dict(), option=orjson.OPT_INDENT_2).decode() + "\n")
+    print(f"{summary.games} games in {elapsed:.1f}s, results in {args.out}")
+
+
+if __name__ == "__main__":
+    main()
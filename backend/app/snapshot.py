@@ -0,0 +1,121 @@
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List
+
+import orjson
+
+from .models import Game, GameLog, GameState, Lobby, Player, PlayerStatus, Effect, CardInstance, state_fields
+from .content import card_templates, characters_by_id
+
+# Full engine state of a game, hidden parts included (decks, RNG state).
+# Cards and characters are stored by id and resolved against content.py on
+# load; card instances get new uids.
+
+_CARD_PILES = ("hand", "deck", "discard_pile")
+
+
+def _cards_to_list(cards: List[CardInstance]) -> List[Any]:
+    return [[c.id, c.cost_override, c.is_copied] if c.cost_override is not None or c.is_copied else c.id for c in cards]
+
+
+def _cards_from_list(data: List[Any]) -> List[CardInstance]:
+    cards = []
+    for item in data:
+        if isinstance(item, str):
+            cards.append(CardInstance(card_templates[item]))
+        else:
+            card_id, cost, is_copied = item
+            cards.append(CardInstance(card_templates[card_id], cost, is_copied))
+    return cards
+
+
+def _effect_to_list(e: Effect) -> List[Any]:
+    return [e.name, e.duration, e.value, e.source_player_id, e.target_id]
+
+
+def _player_to_dict(player: Player) -> Dict[str, Any]:
+    data = {}
+    for name in state_fields(Player):
+        value = getattr(player, name)
+        if name in _CARD_PILES:
+            value = _cards_to_list(value)
+        elif name == "effects":
+            value = [_effect_to_list(e) for e in value]
+        elif name == "character":
+            value = value.id if value else None
+        elif name == "status":
+            value = value.value
+        data[name] = value
+    return data
+
+
+def _player_from_dict(data: Dict[str, Any]) -> Player:
+    data = dict(data)
+    for name in _CARD_PILES:
+        data[name] = _cards_from_list(data[name])
+    data["effects"] = [
+        Effect(name=name, duration=duration, value=value, source_player_id=source_id, target_id=target_id)
+        for name, duration, value, source_id, target_id in data["effects"]
+    ]
+    data["character"] = characters_by_id[data["character"]] if data["character"] else None
+    data["status"] = PlayerStatus(data["status"])
+    return Player(**data)
+
+
+def game_to_dict(game: Game) -> Dict[str, Any]:
+    version, state, gauss = game.rng.getstate()
+    return {
+        "game_id": game.game_id,
+        "players": [_player_to_dict(p) for p in game.players],
+        "current_turn_player_index": game.current_turn_player_index,
+        "round_number": game.round_number,
+        "game_state": game.game_state.value,
+        "active_domain": game.active_domain.id if game.active_domain else None,
+        "game_log": [game.game_log.capacity, game.game_log.next_seq, list(game.game_log.entries)],
+        "is_training": game.is_training,
+        "turn_start_time": game.turn_start_time.isoformat() if game.turn_start_time else None,
+        "version": game.version,
+        "seed": game.seed,
+        "rng": [version, state, gauss],
+    }
+
+
+def game_from_dict(data: Dict[str, Any]) -> Game:
+    capacity, next_seq, entries = data["game_log"]
+    game = Game(
+        game_id=data["game_id"],
+        players=[_player_from_dict(p) for p in data["players"]],
+        current_turn_player_index=data["current_turn_player_index"],
+        round_number=data["round_number"],
+        game_state=GameState(data["game_state"]),
+        active_domain=card_templates[data["active_domain"]] if data["active_domain"] else None,
+        game_log=GameLog(capacity=capacity, next_seq=next_seq, entries=deque(tuple(e) for e in entries)),
+        is_training=data["is_training"],
+        turn_start_time=datetime.fromisoformat(data["turn_start_time"]) if data["turn_start_time"] else None,
+        version=data["version"],
+        seed=data["seed"],
+    )
+    version, state, gauss = data["rng"]
+    game.rng.setstate((version, tuple(state), gauss))
+    return game
+
+
+def lobby_to_dict(lobby: Lobby) -> Dict[str, Any]:
+    return {
+        "id": lobby.id,
+        "host_id": lobby.host_id,
+        "players": [_player_to_dict(p) for p in lobby.players],
+        "is_training": lobby.is_training,
+    }
+
+
+def lobby_from_dict(data: Dict[str, Any]) -> Lobby:
+    return Lobby(id=data["id"], host_id=data["host_id"], players=[_player_from_dict(p) for p in data["players"]], is_training=data["is_training"])
+
+
+def dump_game(game: Game) -> bytes:
+    return orjson.dumps(game_to_dict(game))
+
+
+def load_game(data: bytes) -> Game:
+    return game_from_dict(orjson.loads(data))
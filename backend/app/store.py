@@ -0,0 +1,156 @@
+"""Where lobbies and games are kept so they survive a restart.
+
+GameManager.store is told about every change (save_game after each accepted
+command, save_lobby after each lobby change) and is read once at startup,
+see shards.start_engine. STATE_STORE picks the implementation:
+
+    memory  (default) nothing is kept, a restart ends every match
+    sqlite  SqliteStore in STATE_DB
+
+SqliteStore writes behind: save_* only marks the object dirty, and every
+FLUSH_INTERVAL seconds the dirty objects are serialized (snapshot.dump_game)
+and written in one transaction on a background thread. Finished games stay
+as an archive until prune() (run by the janitor) deletes them.
+"""
+import asyncio
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import orjson
+
+from .models import Game, GameState, Lobby
+from .snapshot import dump_game, load_game, lobby_to_dict, lobby_from_dict
+
+STATE_STORE = os.environ.get("STATE_STORE", "memory")
+STATE_DB = os.environ.get("STATE_DB", "data/state.sqlite3")
+FLUSH_INTERVAL = 0.1 # seconds
+
+
+class StateStore:
+    """Keeps nothing: the lobbies and games live only in memory."""
+
+    def save_game(self, game: Game):
+        pass
+
+    def delete_game(self, game_id: str):
+        pass
+
+    def save_lobby(self, lobby: Lobby):
+        pass
+
+    def delete_lobby(self, lobby_id: str):
+        pass
+
+    def load(self) -> Tuple[List[Lobby], List[Game]]:
+        """The lobbies and the unfinished games that were kept."""
+        return [], []
+
+    async def prune(self, max_age: float) -> int:
+        """Deletes the games that finished more than `max_age` seconds ago;
+        returns how many."""
+        return 0
+
+    def start(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class SqliteStore(StateStore):
+    def __init__(self, path: str = STATE_DB, flush_interval: float = FLUSH_INTERVAL):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.flush_interval = flush_interval
+        # all the writes happen on this one thread, in order
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix="state-store")
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS games (id TEXT PRIMARY KEY, finished INTEGER NOT NULL, version INTEGER NOT NULL, data BLOB NOT NULL, updated REAL NOT NULL DEFAULT 0)")
+        if "updated" not in {row[1] for row in self._db.execute("PRAGMA table_info(games)")}:
+            self._db.execute("ALTER TABLE games ADD COLUMN updated REAL NOT NULL DEFAULT 0")
+        self._db.execute("CREATE TABLE IF NOT EXISTS lobbies (id TEXT PRIMARY KEY, data BLOB NOT NULL)")
+        self._db.commit()
+        # id -> object to write, None to delete
+        self._games: Dict[str, Optional[Game]] = {}
+        self._lobbies: Dict[str, Optional[Lobby]] = {}
+        self._task: asyncio.Task | None = None
+
+    def save_game(self, game: Game):
+        self._games[game.game_id] = game
+
+    def delete_game(self, game_id: str):
+        self._games[game_id] = None
+
+    def save_lobby(self, lobby: Lobby):
+        self._lobbies[lobby.id] = lobby
+
+    def delete_lobby(self, lobby_id: str):
+        self._lobbies[lobby_id] = None
+
+    def load(self) -> Tuple[List[Lobby], List[Game]]:
+        lobbies = [lobby_from_dict(orjson.loads(data)) for data, in self._db.execute("SELECT data FROM lobbies")]
+        games = [load_game(data) for data, in self._db.execute("SELECT data FROM games WHERE finished = 0")]
+        return lobbies, games
+
+    def _take_batch(self):
+        """Serializes the dirty objects; must run on the event loop thread,
+        where the games change."""
+        games, self._games = self._games, {}
+        lobbies, self._lobbies = self._lobbies, {}
+        now = time.time()
+        game_rows = [(game_id, int(game.game_state == GameState.FINISHED), game.version, dump_game(game), now)
+                     for game_id, game in games.items() if game is not None]
+        lobby_rows = [(lobby_id, orjson.dumps(lobby_to_dict(lobby))) for lobby_id, lobby in lobbies.items() if lobby is not None]
+        deleted_games = [(game_id,) for game_id, game in games.items() if game is None]
+        deleted_lobbies = [(lobby_id,) for lobby_id, lobby in lobbies.items() if lobby is None]
+        return game_rows, lobby_rows, deleted_games, deleted_lobbies
+
+    def _write(self, game_rows, lobby_rows, deleted_games, deleted_lobbies):
+        with self._db:
+            self._db.executemany("INSERT OR REPLACE INTO games (id, finished, version, data, updated) VALUES (?, ?, ?, ?, ?)", game_rows)
+            self._db.executemany("INSERT OR REPLACE INTO lobbies VALUES (?, ?)", lobby_rows)
+            self._db.executemany("DELETE FROM games WHERE id = ?", deleted_games)
+            self._db.executemany("DELETE FROM lobbies WHERE id = ?", deleted_lobbies)
+
+    async def prune(self, max_age: float) -> int:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._writer, self._prune, time.time() - max_age)
+
+    def _prune(self, cutoff: float) -> int:
+        with self._db:
+            return self._db.execute("DELETE FROM games WHERE finished = 1 AND updated < ?", (cutoff,)).rowcount
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self._games or self._lobbies:
+                try:
+                    await loop.run_in_executor(self._writer, self._write, *self._take_batch())
+                except sqlite3.Error as e:
+                    print(f"State store write failed: {e!r}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def close(self):
+        """Writes what is still dirty and closes the database."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._writer.shutdown(wait=True)
+        if self._games or self._lobbies:
+            self._write(*self._take_batch())
+        self._db.close()
+
+
+def open_store() -> StateStore:
+    if STATE_STORE == "sqlite":
+        return SqliteStore()
+    return StateStore()
@@ -0,0 +1,81 @@
+"""One scheduler for all the turn deadlines.
+
+Deadlines live in a heap keyed by game id; a single task sleeps until the
+earliest one. Re-arming a game pushes a new entry and leaves the old one in
+the heap, it is skipped when it comes up (and dropped when the heap gets
+much bigger than the number of pending deadlines), so arm and cancel are
+O(log n) and O(1).
+"""
+import asyncio
+import heapq
+import itertools
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Set, Tuple
+
+
+class DeadlineScheduler:
+    def __init__(self, on_deadline: Callable[[str], Awaitable[None]]):
+        self.on_deadline = on_deadline
+        self._deadlines: Dict[str, datetime] = {}
+        self._heap: List[Tuple[datetime, int, str]] = []
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._fired: Set[asyncio.Task] = set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._deadlines)
+
+    def arm(self, key: str, deadline: datetime):
+        """Calls on_deadline(key) at `deadline` (UTC), replacing the deadline
+        `key` had."""
+        if self._deadlines.get(key) == deadline:
+            return
+        self._deadlines[key] = deadline
+        heapq.heappush(self._heap, (deadline, next(self._seq), key))
+        if len(self._heap) > 2 * len(self._deadlines) + 64:
+            self._compact()
+        if self._heap[0][2] == key:
+            self._wakeup.set()
+
+    def cancel(self, key: str):
+        self._deadlines.pop(key, None)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def _compact(self):
+        self._heap = [entry for entry in self._heap if self._deadlines.get(entry[2]) == entry[0]]
+        heapq.heapify(self._heap)
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            # stale entries of re-armed or cancelled keys
+            while self._heap and self._deadlines.get(self._heap[0][2]) != self._heap[0][0]:
+                heapq.heappop(self._heap)
+            timeout = (self._heap[0][0] - datetime.utcnow()).total_seconds() if self._heap else None
+            if timeout is None or timeout > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            deadline, _, key = heapq.heappop(self._heap)
+            del self._deadlines[key]
+            # a slow callback must not hold up the following deadlines
+            task = asyncio.create_task(self.on_deadline(key))
+            self._fired.add(task)
+            task.add_done_callback(self._done)
+
+    def _done(self, task: asyncio.Task):
+        self._fired.discard(task)
+        if not task.cancelled() and task.exception():
+            print(f"Turn deadline callback failed: {task.exception()!r}")
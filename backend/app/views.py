@@ -0,0 +1,72 @@
+from typing import Any, Dict, Optional, Tuple
+
+from .models import Game, Player
+from .catalog import catalog
+from . import rules
+
+# Player fields that are rendered by hand below instead of dumped
+CARD_FIELDS = {"character", "hand", "deck", "discard_pile"}
+
+
+def _can_see_energy(viewer: Optional[Player]) -> bool:
+    # Gojo's Six Eyes: sees the exact energy of every player
+    return bool(viewer and viewer.character and viewer.character.id == "gojo_satoru")
+
+
+def render_player(player: Player, viewer: Optional[Player]) -> Dict[str, Any]:
+    """Projection of `player` as seen by `viewer` (None for spectators).
+
+    Only the owner sees their hand; deck contents are hidden from everyone.
+    The character and cards are sent as catalog references.
+    """
+    is_owner = viewer is not None and viewer.id == player.id
+    data = player.dict(exclude=CARD_FIELDS)
+    data["character"] = player.character.id if player.character else None
+    data["discard_pile"] = [catalog.card_ref(c) for c in player.discard_pile]
+    data["hand_count"] = len(player.hand)
+    data["deck_count"] = len(player.deck)
+    if is_owner:
+        data["hand"] = [catalog.card_ref(c) for c in player.hand]
+    elif not _can_see_energy(viewer):
+        data["energy"] = None
+    return data
+
+
+def render_game(game: Game, viewer_id: Optional[str]) -> Dict[str, Any]:
+    viewer = game.player(viewer_id)
+    data = game.dict(exclude=("players", "game_log", "active_domain", "seed"))
+    data["active_domain"] = catalog.card_ref(game.active_domain) if game.active_domain else None
+    data["players"] = [render_player(p, viewer) for p in game.players]
+    # what the viewer may play right now, so clients don't have to try
+    data["playable"] = rules.playable_cards(game, viewer) if viewer else {}
+    # the log itself is streamed separately, see delta.DeltaTracker
+    data["log_seq"] = game.game_log.next_seq
+    return data
+
+
+class ViewCache:
+    """Per-recipient game views, cached by (game version, recipient).
+
+    A view is rendered at most once per version; once the game moves on to a
+    new version all of its cached views are dropped.
+    """
+
+    def __init__(self):
+        # game_id -> (version, {viewer_id: view})
+        self._views: Dict[str, Tuple[int, Dict[Optional[str], Dict[str, Any]]]] = {}
+
+    def get(self, game: Game, viewer_id: Optional[str]) -> Dict[str, Any]:
+        version, views = self._views.get(game.game_id, (None, None))
+        if version != game.version:
+            views = {}
+            self._views[game.game_id] = (game.version, views)
+        view = views.get(viewer_id)
+        if view is None:
+            view = views[viewer_id] = render_game(game, viewer_id)
+        return view
+
+    def forget(self, game_id: str):
+        self._views.pop(game_id, None)
+
+
+view_cache = ViewCache()
@@ -1,25 +1,101 @@
+import asyncio
 from fastapi import WebSocket
-from typing import Dict, Set
+from typing import Awaitable, Callable, Dict, List, Set
 from starlette.websockets import WebSocketState
+import orjson
 
 # player_id -> websocket
 connections: Dict[str, WebSocket] = {}
 # lobby_id -> set(player_id)
 lobby_rooms: Dict[str, Set[str]] = {}
 
+# seconds a single socket may take to accept a message before it is dropped
+SEND_TIMEOUT = 2.0
+
 async def register(lobby_id: str, player_id: str, ws: WebSocket):
     connections[player_id] = ws
     lobby_rooms.setdefault(lobby_id, set()).add(player_id)
 
-async def unregister(lobby_id: str, player_id: str):
+async def unregister(lobby_id: str, player_id: str, ws: WebSocket | None = None) -> bool:
+    """False if `ws` is no longer the player's socket: they have reconnected."""
+    if ws is not None and connections.get(player_id) is not ws:
+        return False
     lobby_rooms.get(lobby_id, set()).discard(player_id)
     connections.pop(player_id, None)
+    return True
+
+def encode(message: dict) -> str:
+    """Serializes a message once so it can be sent as-is to every socket."""
+    return orjson.dumps(message).decode()
+
+async def _send_text(ws: WebSocket | None, text: str):
+    if not ws or ws.application_state != WebSocketState.CONNECTED:
+        raise ConnectionError("socket is not connected")
+    await asyncio.wait_for(ws.send_text(text), SEND_TIMEOUT)
+
+async def _drop(lobby_id: str, player_id: str, ws: WebSocket | None):
+    room = lobby_rooms.get(lobby_id)
+    if room is not None:
+        room.discard(player_id)
+        if not room:
+            del lobby_rooms[lobby_id]
+    # the player may already have reconnected with a new socket
+    if connections.get(player_id) is ws:
+        connections.pop(player_id, None)
+    if ws and ws.application_state == WebSocketState.CONNECTED:
+        try:
+            await asyncio.wait_for(ws.close(), SEND_TIMEOUT)
+        except Exception:
+            pass
+
+# set in engine shard processes, which have no sockets: the messages (and
+# whether to close the room after them) are handed to the web process
+# instead, see shards.py
+publisher: Callable[[str, Dict[str, str], bool], Awaitable[None]] | None = None
+
+async def _fan_out(lobby_id: str, text_for: Callable[[str], str], close: bool = False) -> List[str]:
+    texts = {pid: text_for(pid) for pid in lobby_rooms.get(lobby_id, ())}
+    if publisher:
+        await publisher(lobby_id, texts, close)
+        if close:
+            lobby_rooms.pop(lobby_id, None)
+        return []
+    failed = await deliver(lobby_id, texts)
+    if close:
+        await drop_room(lobby_id)
+    return failed
+
+async def drop_room(lobby_id: str):
+    """Closes the sockets of everyone in the lobby and removes its room."""
+    room = lobby_rooms.pop(lobby_id, set())
+    await asyncio.gather(*(_drop(lobby_id, pid, connections.get(pid)) for pid in room))
+
+async def deliver(lobby_id: str, texts: Dict[str, str]) -> List[str]:
+    """Sends player id -> text concurrently, see `broadcast`."""
+    pids = list(texts)
+    sockets = [connections.get(pid) for pid in pids]
+    results = await asyncio.gather(*(_send_text(ws, texts[pid]) for pid, ws in zip(pids, sockets)), return_exceptions=True)
+
+    failed = [(pid, ws) for pid, ws, result in zip(pids, sockets, results) if isinstance(result, BaseException)]
+    if failed:
+        await asyncio.gather(*(_drop(lobby_id, pid, ws) for pid, ws in failed))
+    return [pid for pid, _ in failed]
+
+async def broadcast(lobby_id: str, message: dict) -> List[str]:
+    """Sends `message` to every socket in the lobby concurrently.
+
+    Returns the ids of players whose send failed or timed out; their
+    connections are removed from the room.
+    """
+    text = encode(message)
+    return await _fan_out(lobby_id, lambda pid: text)
+
+async def broadcast_each(lobby_id: str, message_for: Callable[[str], dict]) -> List[str]:
+    """Like `broadcast`, but every player gets their own `message_for(player_id)`."""
+    return await _fan_out(lobby_id, lambda pid: encode(message_for(pid)))
 
-async def broadcast(lobby_id: str, message: dict):
-    for pid in list(lobby_rooms.get(lobby_id, set())):
-        ws = connections.get(pid)
-        if ws and ws.application_state == WebSocketState.CONNECTED:
-            try:
-                await ws.send_json(message)
-            except Exception:
-                pass 
\ No newline at end of file
+async def close_room(lobby_id: str, message: dict):
+    """Sends `message` to every socket in the lobby, then closes them and
+    removes the room."""
+    text = encode(message)
+    await _fan_out(lobby_id, lambda pid: text, close=True)
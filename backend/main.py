@@ -1,16 +1,27 @@
 import uvicorn
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api import router as api_router
-from app.websockets import register, unregister, broadcast
-from app.game import game_manager, GameException
-from app.lobby import lobby_manager
+from app.websockets import register, unregister
+from app.game import cards_without_effect_handler, GameException
+from app import shards
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    missing = cards_without_effect_handler()
+    if missing:
+        print(f"Cards without an effect handler: {', '.join(missing)}")
+    await shards.start()
+    yield
+    await shards.stop()
 
 app = FastAPI(
     title="Jujutsu Kaisen: Cursed Clash API",
     description="API for the Jujutsu Kaisen: Cursed Clash card game.",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 origins = [
@@ -32,68 +43,46 @@ app.include_router(api_router, prefix="/api")
 async def read_root():
     return {"message": "Welcome to the Jujutsu Kaisen: Cursed Clash API!"}
 
+# ws message type -> (GameManager method, its arguments after the game id)
+GAME_COMMANDS = {
+    "play_card": lambda player_id, p: ("play_card", player_id, p.get("card_id"), p.get("target_id"), p.get("targets_ids")),
+    "end_turn": lambda player_id, p: ("end_turn", player_id),
+    "discard_cards": lambda player_id, p: ("discard_cards", player_id, p.get("card_ids", [])),
+    "add_dummy": lambda player_id, p: ("add_dummy",),
+    "undo_card": lambda player_id, p: ("undo_card", player_id),
+    "remove_dummy": lambda player_id, p: ("remove_dummy", p.get("dummy_id")),
+}
+
 @app.websocket("/ws/{lobby_id}/{player_id}")
 async def websocket_endpoint(ws: WebSocket, lobby_id: str, player_id: str):
     await ws.accept()
     await register(lobby_id, player_id, ws)
 
-    # отправляем актуальное состояние лобби новому подключившемуся
-    lobby = lobby_manager.get_lobby(lobby_id)
-    if lobby:
-        await ws.send_json({"type": "lobby_update", "payload": lobby.dict()})
+    # состояние лобби и, при переподключении к идущей игре, полный снапшот
+    for message in await shards.call(lobby_id, "connect", lobby_id, player_id):
+        await ws.send_json(message)
     try:
         while True:
             data = await ws.receive_json()
             msg_type = data.get("type")
             payload = data.get("payload", {})
 
-            if msg_type == "play_card":
-                try:
-                    game = game_manager.play_card(
-                        payload.get("game_id"),
-                        player_id,
-                        payload.get("card_id"),
-                        payload.get("target_id"),
-                        payload.get("targets_ids"),
-                    )
-                    await broadcast(lobby_id, {"type": "game_state", "payload": game.dict()})
-                except GameException as e:
-                    await ws.send_json({"type": "error", "payload": str(e)})
-
-            elif msg_type == "end_turn":
-                try:
-                    game = game_manager.end_turn(payload.get("game_id"), player_id)
-                    await broadcast(lobby_id, {"type": "game_state", "payload": game.dict()})
-                except GameException as e:
-                    await ws.send_json({"type": "error", "payload": str(e)})
-
-            elif msg_type == "discard_cards":
+            command = GAME_COMMANDS.get(msg_type)
+            if command:
                 try:
-                    game = game_manager.discard_cards(
-                        payload.get("game_id"),
-                        player_id,
-                        payload.get("card_ids", []),
-                    )
-                    await broadcast(lobby_id, {"type": "game_state", "payload": game.dict()})
+                    await shards.call(lobby_id, "command", lobby_id, payload.get("game_id"), *command(player_id, payload))
                 except GameException as e:
                     await ws.send_json({"type": "error", "payload": str(e)})
 
-            elif msg_type == "add_dummy":
-                try:
-                    game = game_manager.add_dummy(payload.get("game_id"))
-                    await broadcast(lobby_id, {"type": "game_state", "payload": game.dict()})
-                except GameException as e:
-                    await ws.send_json({"type": "error", "payload": str(e)})
-            
-            elif msg_type == "remove_dummy":
-                try:
-                    game = game_manager.remove_dummy(payload.get("game_id"), payload.get("dummy_id"))
-                    await broadcast(lobby_id, {"type": "game_state", "payload": game.dict()})
-                except GameException as e:
-                    await ws.send_json({"type": "error", "payload": str(e)})
+            elif msg_type == "sync_request":
+                # клиент потерял версию (пропустил game_delta) и просит полный снапшот
+                message = await shards.call(lobby_id, "sync", payload.get("game_id"), player_id, payload.get("log_since"))
+                if message:
+                    await ws.send_json(message)
 
     except WebSocketDisconnect:
-        await unregister(lobby_id, player_id)
+        if await unregister(lobby_id, player_id, ws):
+            await shards.call(lobby_id, "disconnect", lobby_id, player_id)
 
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
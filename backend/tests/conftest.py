@@ -0,0 +1,32 @@
+import pytest
+
+from app.content import characters_by_id
+from app.game import GameManager
+from app.models import Game, Lobby, Player
+
+
+def make_players(character_ids):
+    players = []
+    for i, character_id in enumerate(character_ids):
+        ch = characters_by_id[character_id]
+        players.append(Player(id=f"p{i}", nickname=f"P{i}", character=ch, hp=ch.max_hp, max_hp=ch.max_hp, energy=ch.max_energy))
+    return players
+
+
+@pytest.fixture
+def gm() -> GameManager:
+    return GameManager()
+
+
+@pytest.fixture
+def new_game(gm):
+    """Creates and registers a game of the given characters in `gm`."""
+    def create(character_ids, seed=0, is_training=False, lobby_id="TEST01") -> Game:
+        players = make_players(character_ids)
+        lobby = Lobby(id=lobby_id, host_id=players[0].id, players=players, is_training=is_training)
+        game = gm._create_game_from_lobby(lobby, seed=seed)
+        gm.games[game.game_id] = game
+        if gm.event_log:
+            gm.event_log.start(game)
+        return game
+    return create
@@ -0,0 +1,39 @@
+import asyncio
+
+import pytest
+
+from app import actors
+from app.exceptions import GameException
+
+
+def test_failed_broadcast_does_not_stop_the_actor(gm, new_game, monkeypatch):
+    game = new_game(["gojo_satoru", "jogo"], seed=1)
+
+    async def broken_broadcast(lobby_id, game):
+        raise RuntimeError("view failed")
+    monkeypatch.setattr(actors, "broadcast_game", broken_broadcast)
+
+    async def play():
+        for _ in range(3):
+            player_id = game.players[game.current_turn_player_index].id
+            await asyncio.wait_for(gm.actors.submit("TEST01", game.game_id, "end_turn", player_id), 1)
+    asyncio.run(play())
+    assert game.version == 3
+
+
+def test_queued_commands_fail_when_the_actor_stops(gm, new_game):
+    game = new_game(["gojo_satoru", "jogo"], seed=1)
+
+    async def play():
+        player_id = game.players[game.current_turn_player_index].id
+        first = asyncio.create_task(gm.actors.submit("TEST01", game.game_id, "end_turn", player_id))
+        await asyncio.sleep(0)
+        actor = gm.actors._actors[game.game_id]
+        queued = asyncio.create_task(actor.submit("end_turn", player_id))
+        await asyncio.sleep(0)
+        actor.task.cancel()
+        with pytest.raises(GameException):
+            await asyncio.wait_for(queued, 1)
+        await asyncio.gather(first, return_exceptions=True)
+        assert game.game_id not in gm.actors._actors
+    asyncio.run(play())
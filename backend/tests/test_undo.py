@@ -0,0 +1,48 @@
+from app import rules
+from app.delta import DeltaTracker
+
+
+def test_log_seq_never_goes_back_across_undo(gm, new_game):
+    game = new_game(["gojo_satoru"], seed=5, is_training=True)
+    gm.add_dummy(game.game_id)
+    tracker = DeltaTracker()
+    messages = [tracker.broadcast_message(game, "p0")]
+
+    def send():
+        messages.append(tracker.broadcast_message(game, "p0"))
+
+    move = rules.legal_moves(game, "p0")[0]
+    gm.play_card(game.game_id, "p0", *move)
+    send()
+    undone = game.game_log.next_seq
+    gm.undo_card(game.game_id, "p0")
+    send()
+    assert game.game_log.next_seq > undone
+    dummy = next(p.id for p in game.players if "dummy" in p.id)
+    gm.remove_dummy(game.game_id, dummy)
+    send()
+    gm.end_turn(game.game_id, "p0")
+    send()
+
+    log_seqs = [messages[0]["payload"]["log_seq"]]
+    for message in messages[1:]:
+        log_seqs.append(message["payload"].get("changes", {}).get("log_seq", log_seqs[-1]))
+    assert log_seqs == sorted(log_seqs)
+    sent = [seq for seq, _ in messages[0]["payload"]["game_log"]]
+    for message in messages[1:]:
+        sent += [seq for seq, _ in message["payload"].get("log_append", [])]
+    assert sent == sorted(set(sent))
+    assert sent == [seq for seq, _ in game.game_log.entries]
+
+
+def test_undo_restores_the_game_but_keeps_the_log(gm, new_game):
+    game = new_game(["gojo_satoru"], seed=5, is_training=True)
+    gm.add_dummy(game.game_id)
+    before = [(p.id, p.hp, p.energy, [c.id for c in p.hand]) for p in game.players]
+    gm.play_card(game.game_id, "p0", *rules.legal_moves(game, "p0")[0])
+    log = list(game.game_log.entries)
+
+    gm.undo_card(game.game_id, "p0")
+    assert [(p.id, p.hp, p.energy, [c.id for c in p.hand]) for p in game.players] == before
+    assert list(game.game_log.entries)[:len(log)] == log
+    assert game.game_log.entries[-1][1] == "P0 отменяет последнюю карту."
@@ -6,6 +6,7 @@ import { motion } from 'framer-motion';
 interface CardProps {
   card: CardType;
   isPlayable: boolean;
+  cost?: number; // what the card costs the player right now, if it differs
   onClick?: () => void;
   index?: number;
   total?: number;
@@ -58,7 +59,7 @@ const rarityClass = (rarity: string) => {
   }
 };
 
-export const Card: React.FC<CardProps> = ({ card, isPlayable, onClick, index = 0, total = 1, isSelected = false, className }) => {
+export const Card: React.FC<CardProps> = ({ card, isPlayable, cost, onClick, index = 0, total = 1, isSelected = false, className }) => {
   const angle = (index - (total - 1) / 2) * 10;
   const yOffset = isSelected ? -80 : 0;
   const scaleVal = isSelected ? 1.25 : 1;
@@ -79,7 +80,7 @@ export const Card: React.FC<CardProps> = ({ card, isPlayable, onClick, index = 0
       <div className="card-image">Image</div>
       <div className="card-header">
         <span className={clsx('card-name', nameCss, { 'card-name-fire': isKamino })} data-text={card.name}>{card.name}</span>
-        <span className="card-cost">{card.cost}</span>
+        <span className="card-cost">{cost ?? card.cost}</span>
       </div>
       <div className="card-body">
         <p className="card-description">{prepareDescription(card.description)}</p>
@@ -1,6 +1,8 @@
 import { useEffect, useRef } from 'react';
 import { createWS } from '../services/ws';
 import useGameStore from '../store/gameStore';
+import { applyGameDelta } from '../services/gameDelta';
+import { hydrateDelta, hydrateGame, loadCatalog } from '../services/catalog';
 import { useNavigate } from 'react-router-dom';
 
 export const useWS = () => {
@@ -13,15 +15,35 @@ export const useWS = () => {
     const ws = createWS(lobby.id, player.id);
     wsRef.current = ws;
 
-    ws.onmessage = (e) => {
+    ws.onmessage = async (e) => {
       const { type, payload } = JSON.parse(e.data);
       if (type === 'lobby_update') setLobby(payload);
       if (type === 'game_state') {
-        setGame(payload);
+        const catalog = await loadCatalog();
+        const current = useGameStore.getState().game;
+        const next = hydrateGame(catalog, payload);
+        // снапшот по sync_request несёт только хвост лога — склеиваем с тем, что уже есть
+        if (current?.game_id === next.game_id && next.game_log.length > 0) {
+          const firstSeq = next.game_log[0][0];
+          next.game_log = [...current.game_log.filter(([seq]) => seq < firstSeq), ...next.game_log];
+        }
+        setGame(next);
         if (payload.game_state === 'IN_GAME') {
           navigate(`/game/${payload.game_id}`);
         }
       }
+      if (type === 'game_delta') {
+        const catalog = await loadCatalog();
+        const current = useGameStore.getState().game;
+        const next = current ? applyGameDelta(current, hydrateDelta(catalog, payload)) : null;
+        if (next) {
+          setGame(next);
+        } else {
+          // пропустили версию — просим полный снапшот
+          const log_since = current?.game_id === payload.game_id ? current.log_seq : undefined;
+          ws.send(JSON.stringify({ type: 'sync_request', payload: { game_id: payload.game_id, log_since } }));
+        }
+      }
       if (type === 'error') setError(payload);
       if (type === 'player_kicked') {
         console.log('Player kicked:', payload);
@@ -32,6 +54,12 @@ export const useWS = () => {
           navigate('/');
         }
       }
+      if (type === 'lobby_closed') {
+        alert('Лобби закрыто из-за неактивности.');
+        setLobby(null);
+        setGame(null);
+        navigate('/');
+      }
     };
 
     ws.onerror = () => setError('WebSocket error');
@@ -82,5 +110,12 @@ export const useWS = () => {
     }
   };
 
-  return { send, emitPlayCard, emitEndTurn, emitDiscardCards, emitAddDummy, emitRemoveDummy };
+  const emitUndoCard = () => {
+    const gameId = game?.game_id;
+    if (gameId) {
+      send('undo_card', { game_id: gameId });
+    }
+  };
+
+  return { send, emitPlayCard, emitEndTurn, emitDiscardCards, emitAddDummy, emitRemoveDummy, emitUndoCard };
 }; 
\ No newline at end of file
@@ -4,7 +4,8 @@ import useGameStore from '../store/gameStore';
 import { useWS } from '../hooks/useSocket';
 import PlayerPod from '../components/PlayerPod';
 import { Card } from '../components/Card';
-import type { Card as CardType } from '../types';
+import type { Card as CardType, LogEntry } from '../types';
+import { api } from '../services/api';
 
 const getMultiTargetCount = (card: CardType): number | null => {
   if (card.id === 'jogo_ember_insects') {
@@ -15,7 +16,7 @@ const getMultiTargetCount = (card: CardType): number | null => {
 
 const GamePage: React.FC = () => {
   const { game, player: self, reset: resetGame } = useGameStore();
-  const { emitPlayCard, emitEndTurn, emitDiscardCards, emitAddDummy, emitRemoveDummy } = useWS();
+  const { emitPlayCard, emitEndTurn, emitDiscardCards, emitAddDummy, emitRemoveDummy, emitUndoCard } = useWS();
   const navigate = useNavigate();
 
   const [selectedCard, setSelectedCard] = useState<CardType | null>(null);
@@ -24,8 +25,11 @@ const GamePage: React.FC = () => {
   const [discardSelection, setDiscardSelection] = useState<CardType[]>([]);
   const [multiTargetSelection, setMultiTargetSelection] = useState<string[]>([]);
   const [timeLeft, setTimeLeft] = useState(60);
+  const [olderLog, setOlderLog] = useState<LogEntry[]>([]);
+  const [hasOlderLog, setHasOlderLog] = useState(true);
 
   const multiTargetCount = useMemo(() => selectedCard ? getMultiTargetCount(selectedCard) : null, [selectedCard]);
+  const selectedTargets = selectedCard ? game?.playable?.[selectedCard.id]?.targets : undefined;
   const currentPlayer = useMemo(() => game ? game.players[game.current_turn_player_index] : null, [game]);
   const selfPlayer = useMemo(() => game?.players.find(p => p.id === self?.id), [game, self]);
   const hasDiscardedThisRound = selfPlayer && game ? selfPlayer.last_discard_round === game.round_number : false;
@@ -38,11 +42,7 @@ const GamePage: React.FC = () => {
       setDiscardSelection(updated);
       return;
     }
-    if (!isMyTurn) return;
-    const selfEnergy = selfPlayer?.energy ?? 0;
-    if (selfEnergy < card.cost) {
-      return;
-    }
+    if (!isMyTurn || !game?.playable?.[card.id]) return;
     if (selectedCard === card) {
       // Deselect on second click
       setSelectedCard(null);
@@ -99,6 +99,15 @@ const GamePage: React.FC = () => {
     setMultiTargetSelection([]);
   };
 
+  const loadOlderLog = async () => {
+    if (!game) return;
+    const oldest = olderLog[0] ?? game.game_log[0];
+    if (!oldest) return;
+    const { data } = await api.getGameLog(game.game_id, oldest[0]);
+    setOlderLog([...data.entries, ...olderLog]);
+    setHasOlderLog(data.entries.length > 0 && data.first_seq !== null && data.entries[0][0] > data.first_seq);
+  };
+
   const handleEndTurn = () => {
     emitEndTurn();
   };
@@ -195,7 +204,7 @@ const GamePage: React.FC = () => {
               key={p.id} 
               player={p} 
               isCurrent={p.id === currentPlayer?.id}
-              isTargetable={targeting}
+              isTargetable={targeting && (!selectedTargets || selectedTargets.includes(p.id))}
               onSelect={(targetId, event) => handlePlayerSelect(targetId, event)}
               viewerIsGojo={viewerIsGojo}
               isTraining={game.is_training}
@@ -207,7 +216,10 @@ const GamePage: React.FC = () => {
       <div className="game-log">
         <h3>Game Log</h3>
         <div>
-          {game.game_log.map((entry, i) => <p key={i} className="game-log-entry">{entry}</p>).reverse()}
+          {[...olderLog, ...game.game_log].map(([seq, text]) => <p key={seq} className="game-log-entry">{text}</p>).reverse()}
+          {hasOlderLog && game.game_log.length > 0 && game.game_log[0][0] > 0 && (
+            <button onClick={loadOlderLog}>Показать раньше</button>
+          )}
         </div>
       </div>
       <div className="player-ui">
@@ -215,14 +227,15 @@ const GamePage: React.FC = () => {
            <PlayerPod player={selfPlayer} isCurrent={isMyTurn} isTargetable={targeting} onSelect={(targetId, event) => handlePlayerSelect(targetId, event)} isSelf={true} onEndTurn={handleEndTurn} viewerIsGojo={viewerIsGojo} />
         </div>
         <div className="player-hand">
-          {selfPlayer.hand.map((card, i) => (
+          {(selfPlayer.hand ?? []).map((card, i) => (
             <Card 
               key={`${card.id}-${i}`} 
               card={card} 
-              isPlayable={isMyTurn && (selfPlayer.energy ?? 0) >= card.cost}
+              isPlayable={!!game.playable?.[card.id]}
+              cost={game.playable?.[card.id]?.cost}
               onClick={() => handleCardClick(card)}
               index={i}
-              total={selfPlayer.hand.length}
+              total={selfPlayer.hand_count}
               isSelected={selectedCard === card}
               className={discardSelection.includes(card) ? 'discard-selected' : undefined}
             />
@@ -230,7 +243,7 @@ const GamePage: React.FC = () => {
         </div>
         <div className="game-controls">
           <div className="deck-info">
-            Deck: {selfPlayer.deck.length} | Discard: {selfPlayer.discard_pile.length}
+            Deck: {selfPlayer.deck_count} | Discard: {selfPlayer.discard_pile.length}
           </div>
           {isMyTurn && (
             <div className="discard-controls">
@@ -246,6 +259,7 @@ const GamePage: React.FC = () => {
           {game.is_training && (
             <div className="training-controls">
               <button onClick={() => emitAddDummy()}>Добавить манекен</button>
+              {isMyTurn && <button onClick={() => emitUndoCard()}>Отменить карту</button>}
             </div>
           )}
         </div>
@@ -27,6 +27,16 @@ const LobbyPage: React.FC = () => {
     }
   };
 
+  const handleAddBot = async () => {
+    if (!lobby || !player?.id || !isHost) return;
+    try {
+      const { data } = await api.addBot(lobby.id, player.id);
+      setLobby(data);
+    } catch (error: any) {
+      setError(error.response?.data?.detail || 'Не удалось добавить бота.');
+    }
+  };
+
   const handleCharacterSelect = async (character: Character) => {
     if (!lobby || !player?.id) return;
     
@@ -90,6 +100,9 @@ const LobbyPage: React.FC = () => {
                 </li>
               ))}
             </ul>
+            {isHost && lobby.players.length < 8 && (
+              <button className="add-bot-btn" onClick={handleAddBot}>Добавить бота</button>
+            )}
           </div>
         )}
         
@@ -1,5 +1,5 @@
 import axios from 'axios';
-import type { LobbyInfo } from '../types';
+import type { Catalog, GameLogPage, LobbyInfo } from '../types';
 
 const apiClient = axios.create({
   baseURL: 'http://185.188.182.11:8002/api',
@@ -24,6 +24,12 @@ export const api = {
     apiClient.post<LobbyInfo>(`/lobby/${lobbyId}/character`, { player_id: playerId, character_id: characterId }),
   startGame: (lobbyId: string, playerId: string) =>
     apiClient.post(`/lobby/${lobbyId}/start`, { player_id: playerId }),
+  addBot: (lobbyId: string, hostId: string) =>
+    apiClient.post<LobbyInfo>(`/lobby/${lobbyId}/bot`, { host_id: hostId }),
   kickPlayer: (lobbyId: string, hostId: string, playerToKickId: string) =>
     apiClient.post<LobbyInfo>(`/lobby/${lobbyId}/kick`, { host_id: hostId, player_to_kick_id: playerToKickId }),
+  getCatalog: () =>
+    apiClient.get<Catalog>('/catalog'),
+  getGameLog: (gameId: string, before?: number, limit = 50) =>
+    apiClient.get<GameLogPage>(`/game/${gameId}/log`, { params: { before, limit } }),
 }; 
\ No newline at end of file
@@ -0,0 +1,54 @@
+import { api } from './api';
+import type { Card, Catalog, CardRef, Character, GameDelta, GameState, Player } from '../types';
+
+// Game state only carries card/character ids; the static data is fetched
+// once from /api/catalog (cached by the browser through its ETag).
+let catalogPromise: Promise<Catalog> | null = null;
+
+export const loadCatalog = (): Promise<Catalog> => {
+  if (!catalogPromise) {
+    catalogPromise = api.getCatalog().then(res => res.data);
+    catalogPromise.catch(() => { catalogPromise = null; });
+  }
+  return catalogPromise;
+};
+
+const hydrateCard = (catalog: Catalog, ref: CardRef): Card => ({ ...catalog.cards[ref.id], ...ref });
+
+const hydrateCharacter = (catalog: Catalog, id: string | null): Character | null => {
+  const data = id ? catalog.characters[id] : null;
+  if (!data) return null;
+  const { unique_card_ids, ...rest } = data;
+  return { ...rest, unique_cards: unique_card_ids.map(cid => catalog.cards[cid]) };
+};
+
+// Works on full players as well as on the partial players of a game_delta
+const hydratePlayer = (catalog: Catalog, player: any): Partial<Player> => {
+  const result = { ...player };
+  if ('character' in player) result.character = hydrateCharacter(catalog, player.character);
+  if (player.hand) result.hand = player.hand.map((c: CardRef) => hydrateCard(catalog, c));
+  if (player.discard_pile) result.discard_pile = player.discard_pile.map((c: CardRef) => hydrateCard(catalog, c));
+  return result;
+};
+
+const hydrateGameFields = (catalog: Catalog, game: any) => {
+  const result = { ...game };
+  if (game.active_domain) result.active_domain = hydrateCard(catalog, game.active_domain);
+  return result;
+};
+
+export const hydrateGame = (catalog: Catalog, game: any): GameState => ({
+  ...hydrateGameFields(catalog, game),
+  players: game.players.map((p: any) => hydratePlayer(catalog, p)),
+});
+
+export const hydrateDelta = (catalog: Catalog, delta: any): GameDelta => {
+  const result = { ...delta };
+  if (delta.changes) result.changes = hydrateGameFields(catalog, delta.changes);
+  if (delta.players) {
+    result.players = Object.fromEntries(
+      Object.entries(delta.players).map(([id, p]) => [id, hydratePlayer(catalog, p)]),
+    );
+  }
+  return result;
+};
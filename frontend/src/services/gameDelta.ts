@@ -0,0 +1,26 @@
+import type { GameDelta, GameState, Player } from '../types';
+
+// Applies a game_delta message on top of the locally known state.
+// Returns null when the delta was built against a different version,
+// in which case the client has to ask the server for a full snapshot.
+export const applyGameDelta = (game: GameState, delta: GameDelta): GameState | null => {
+  if (game.game_id !== delta.game_id || game.version !== delta.base_version) {
+    return null;
+  }
+
+  const byId = new Map<string, Player>(game.players.map(p => [p.id, p]));
+  const order = delta.player_order ?? game.players.map(p => p.id);
+  const players = order.map(id => {
+    const changes = delta.players?.[id];
+    const prev = byId.get(id);
+    return changes ? ({ ...prev, ...changes } as Player) : (prev as Player);
+  });
+
+  return {
+    ...game,
+    ...delta.changes,
+    players,
+    game_log: delta.log_append ? [...game.game_log, ...delta.log_append] : game.game_log,
+    version: delta.version,
+  };
+};
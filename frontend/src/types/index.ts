@@ -7,6 +7,23 @@ export interface Card {
   description: string;
   source_player_id?: string;
   duration?: number;
+  is_copied?: boolean;
+}
+
+// Card as sent in game state: template id plus per-instance overrides
+export interface CardRef {
+  id: string;
+  cost?: number;
+  is_copied?: boolean;
+  source_player_id?: string;
+  duration?: number;
+}
+
+export interface Catalog {
+  version: string;
+  common_card_ids: string[];
+  cards: Record<string, Card>;
+  characters: Record<string, Omit<Character, 'unique_cards'> & { unique_card_ids: string[] }>;
 }
 
 export interface Character {
@@ -36,8 +53,10 @@ export interface Player {
   hp: number | null;
   energy: number | null;
   block: number;
-  hand: Card[];
-  deck: Card[];
+  // hand is only sent to its owner, deck contents are never sent
+  hand?: Card[];
+  hand_count: number;
+  deck_count: number;
   discard_pile: Card[];
   effects: Effect[];
   status: PlayerStatus;
@@ -55,6 +74,22 @@ export interface LobbyInfo {
 
 export type GameStateEnum = 'LOBBY' | 'IN_GAME' | 'FINISHED';
 
+// [seq, text]
+export type LogEntry = [number, string];
+
+export interface GameLogPage {
+  entries: LogEntry[];
+  first_seq: number | null;
+  next_seq: number;
+}
+
+// a card the viewer may play right now, with what it costs them
+export interface PlayableCard {
+  cost: number;
+  targets?: string[]; // alive opponents, if the card takes targets
+  target_count?: number; // for cards with several targets
+}
+
 export interface GameState {
   game_id: string;
   players: Player[];
@@ -62,9 +97,22 @@ export interface GameState {
   round_number: number;
   game_state: GameStateEnum;
   active_domain?: Card;
-  game_log: string[];
+  game_log: LogEntry[];
+  log_seq: number;
   is_training: boolean;
   turn_start_time?: string;
+  version: number;
+  playable: Record<string, PlayableCard>;
+}
+
+export interface GameDelta {
+  game_id: string;
+  base_version: number;
+  version: number;
+  changes?: Partial<GameState>;
+  players?: Record<string, Partial<Player>>;
+  player_order?: string[];
+  log_append?: LogEntry[];
 }
 
 export interface Game {